@@ -1,13 +1,24 @@
-import json
+import asyncio
 import logging
-from typing import List
-from openai import OpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL
+from typing import Any, AsyncIterator, Dict, List
+from pydantic import BaseModel
+import jsoncodec
+from agents.llm import call_structured, call_freeform, stream_freeform
+from config import ANALYSIS_FANOUT
 from schemas.core import CoreEntities, MarketEntities, SignalEntities
 from schemas.outputs import AnalysisOutput, GraphInsights, RedFlag, CompTransaction, PotentialAcquirer, ExitProbability
 
 logger = logging.getLogger(__name__)
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+
+def _compact(value: Any) -> str:
+    """Prompt payload as compact JSON — indentation costs tokens and tells the model nothing."""
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    elif isinstance(value, list):
+        value = [v.model_dump() if isinstance(v, BaseModel) else v for v in value]
+    return jsoncodec.dumps_str(value)
+
 
 # ── Structured schemas for analysis outputs ───────────────────────────────────
 
@@ -80,7 +91,25 @@ ANALYSIS_SCHEMA = {
     },
 }
 
-ANALYSIS_INSTRUCTIONS = """You are an elite VC and M&A analyst.
+_RED_FLAG_PATTERNS = """Common red flag patterns to check:
+- Customer concentration risk
+- Overcrowded / well-funded competitive market
+- First-time founders or key departures
+- Capital inefficiency (raised a lot, limited traction shown)
+- Market timing (too early or too late)
+- Regulatory exposure
+- Technology defensibility
+"""
+
+_ACQUIRER_CRITERIA = """For acquirer ranking, consider:
+- Product adjacency
+- Prior acquisition history in the sector
+- Strategic rationale (distribution, technology, talent, customers)
+"""
+
+_CLOSING = "Be opinionated and data-driven. Every claim must tie to the evidence provided.\n"
+
+ANALYSIS_INSTRUCTIONS = f"""You are an elite VC and M&A analyst.
 
 Given structured data about a company — including its entity profile, market data,
 M&A comparable transactions, relationship graph insights, and risk signals — produce
@@ -93,22 +122,66 @@ Your job:
 4. Rank the top potential acquirers by strategic fit (score 1-10 each)
 5. Assess the company's competitive position (Strong / Moderate / Weak)
 
-Common red flag patterns to check:
-- Customer concentration risk
-- Overcrowded / well-funded competitive market
-- First-time founders or key departures
-- Capital inefficiency (raised a lot, limited traction shown)
-- Market timing (too early or too late)
-- Regulatory exposure
-- Technology defensibility
+{_RED_FLAG_PATTERNS}
+{_ACQUIRER_CRITERIA}
+{_CLOSING}"""
 
-For acquirer ranking, consider:
-- Product adjacency
-- Prior acquisition history in the sector
-- Strategic rationale (distribution, technology, talent, customers)
 
-Be opinionated and data-driven. Every claim must tie to the evidence provided.
-"""
+def _focused_instructions(task: str, guidance: str = "") -> str:
+    return (
+        "You are an elite VC and M&A analyst.\n\n"
+        "Given structured data about a company, produce one part of an investment analysis:\n"
+        f"{task}\n\n"
+        + (f"{guidance}\n" if guidance else "")
+        + _CLOSING
+    )
+
+
+def _sub_schema(*fields: str) -> dict:
+    """ANALYSIS_SCHEMA restricted to `fields`."""
+    return {
+        "type": "object",
+        "additionalProperties": False,
+        "required": list(fields),
+        "properties": {f: ANALYSIS_SCHEMA["properties"][f] for f in fields},
+    }
+
+
+# Fan-out mode: independent slices of ANALYSIS_SCHEMA, each run as its own
+# call with only the prompt sections it needs. Keyed by LLM call name;
+# values are (output fields, prompt sections, instructions).
+SUB_ANALYSES = {
+    "analysis_risks": (
+        ("red_flags", "competitive_position"),
+        ("company", "funding", "traction", "founders", "investors", "competitors", "market", "risk_signals", "graph"),
+        _focused_instructions(
+            "identify and rate red flags (HIGH/MEDIUM/LOW severity), and assess the company's "
+            "competitive position (Strong / Moderate / Weak).",
+            _RED_FLAG_PATTERNS,
+        ),
+    ),
+    "analysis_comps": (
+        ("comps",),
+        ("company", "funding", "traction", "market", "acquisitions"),
+        _focused_instructions(
+            "compile the best M&A comparable transactions, with deal sizes and implied multiples, "
+            "from the raw transactions provided."
+        ),
+    ),
+    "analysis_acquirers": (
+        ("ranked_acquirers",),
+        ("company", "competitors", "market", "acquisitions", "exit_signals", "graph"),
+        _focused_instructions(
+            "rank the top potential acquirers by strategic fit (score 1-10 each).",
+            _ACQUIRER_CRITERIA,
+        ),
+    ),
+    "analysis_exit": (
+        ("exit_probability",),
+        ("company", "funding", "traction", "market", "acquisitions", "exit_signals"),
+        _focused_instructions("score exit probability (IPO: 1-10, Acquisition: 1-10) and the likely timeline."),
+    ),
+}
 
 MEMO_INSTRUCTIONS = """You are a senior venture capital partner at a top-tier fund writing an internal investment memo that will be circulated to the full investment committee.
 
@@ -163,99 +236,92 @@ Include at minimum 4 risks. Do not list risks without actionable implications.
 State **INVEST / PASS / WATCH** in bold. Then write 4–6 sentences covering: your conviction level and why, the single biggest risk to the thesis, what would need to be true (a specific milestone or condition) for the recommendation to change, and — if recommending investment — any suggested terms, conditions, or diligence priorities before closing.
 """
 
-
-def _call_structured(instructions: str, content: str, schema: dict, name: str) -> dict:
-    try:
-        response = client.responses.create(
-            model=OPENAI_MODEL,
-            instructions=instructions,
-            input=content,
-            text={"format": {"type": "json_schema", "name": name, "schema": schema, "strict": True}},
-        )
-        return json.loads(response.output_text)
-    except Exception as e:
-        logger.warning(f"Responses API failed ({e}), falling back")
-
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": content},
-        ],
-        response_format={"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}},
-    )
-    return json.loads(response.choices[0].message.content)
-
-
-def _call_freeform(instructions: str, content: str) -> str:
-    try:
-        response = client.responses.create(
-            model=OPENAI_MODEL,
-            instructions=instructions,
-            input=content,
-        )
-        return response.output_text
-    except Exception as e:
-        logger.warning(f"Responses API (freeform) failed ({e}), falling back")
-
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": content},
-        ],
-    )
-    return response.choices[0].message.content
+MEMO_INPUT_NOTE = (
+    "Note: Determine the most appropriate stage classification (Seed/Series A/B/C/Growth/Public) "
+    "and most likely exit path (IPO vs Strategic Acquisition) from the data — do not ask the user."
+)
 
 
 class AnalysisAgent:
     """Generates structured analysis: red flags, comps, acquirers, exit scores."""
 
-    def analyze(
+    # LLM call names this agent reports under, for per-phase cache status
+    call_names = tuple(SUB_ANALYSES) if ANALYSIS_FANOUT else ("investment_analysis",)
+
+    async def analyze(
         self,
         core: CoreEntities,
         market: MarketEntities,
         signals: SignalEntities,
         graph_insights: GraphInsights,
     ) -> AnalysisOutput:
-        content = self._build_analysis_prompt(core, market, signals, graph_insights)
+        sections = self._analysis_sections(core, market, signals, graph_insights)
+        if ANALYSIS_FANOUT:
+            return await self._analyze_fanout(sections)
+        content = "\n\n".join(sections.values())
         try:
-            data = _call_structured(ANALYSIS_INSTRUCTIONS, content, ANALYSIS_SCHEMA, "investment_analysis")
+            data = await call_structured(ANALYSIS_INSTRUCTIONS, content, ANALYSIS_SCHEMA, "investment_analysis")
             return AnalysisOutput(**data)
         except Exception as e:
             logger.error(f"Analysis failed: {e}")
             return AnalysisOutput()
 
-    def _build_analysis_prompt(
+    async def _analyze_fanout(self, sections: Dict[str, str]) -> AnalysisOutput:
+        """
+        Run every SUB_ANALYSES slice concurrently and merge the parts, so the
+        phase takes as long as the slowest slice. A failed slice leaves its
+        fields at their defaults rather than failing the whole analysis.
+        """
+        async def run(name: str, fields: tuple, wanted: tuple, instructions: str) -> dict:
+            content = "\n\n".join(sections[k] for k in wanted if k in sections)
+            return await call_structured(instructions, content, _sub_schema(*fields), name)
+
+        parts = await asyncio.gather(
+            *(run(name, *spec) for name, spec in SUB_ANALYSES.items()),
+            return_exceptions=True,
+        )
+        data: dict = {}
+        for name, part in zip(SUB_ANALYSES, parts):
+            if isinstance(part, BaseException):
+                logger.error(f"Analysis slice '{name}' failed: {part}")
+                continue
+            data.update(part)
+        try:
+            return AnalysisOutput(**data)
+        except Exception as e:
+            logger.error(f"Analysis merge failed: {e}")
+            return AnalysisOutput()
+
+    def _analysis_sections(
         self,
         core: CoreEntities,
         market: MarketEntities,
         signals: SignalEntities,
         graph_insights: GraphInsights,
-    ) -> str:
-        parts = []
-
-        parts.append(f"## Company\n{core.company.model_dump_json(indent=2)}")
-        parts.append(f"## Funding\n{core.funding.model_dump_json(indent=2)}")
-        parts.append(f"## Traction\n{core.traction.model_dump_json(indent=2)}")
-        parts.append(f"## Founders\n{json.dumps([f.model_dump() for f in core.founders], indent=2)}")
-        parts.append(f"## Investors\n{json.dumps([i.model_dump() for i in core.investors], indent=2)}")
-        parts.append(f"## Competitors\n{json.dumps([c.model_dump() for c in core.competitors], indent=2)}")
-        parts.append(f"## Market\n{market.market.model_dump_json(indent=2)}")
-        parts.append(f"## M&A Transactions (raw)\n{json.dumps([a.model_dump() for a in market.acquisitions], indent=2)}")
-        parts.append(f"## Risk Signals (raw)\n{json.dumps([r.model_dump() for r in signals.risk_signals], indent=2)}")
-        parts.append(f"## Exit Signals\n{signals.exit_signals.model_dump_json(indent=2)}")
-
-        if graph_insights.neo4j_available:
-            parts.append(f"## Graph Insights\n{json.dumps(graph_insights.model_dump(), indent=2)}")
-
-        return "\n\n".join(parts)
+    ) -> Dict[str, str]:
+        sections = {
+            "company": f"## Company\n{_compact(core.company)}",
+            "funding": f"## Funding\n{_compact(core.funding)}",
+            "traction": f"## Traction\n{_compact(core.traction)}",
+            "founders": f"## Founders\n{_compact(core.founders)}",
+            "investors": f"## Investors\n{_compact(core.investors)}",
+            "competitors": f"## Competitors\n{_compact(core.competitors)}",
+            "market": f"## Market\n{_compact(market.market)}",
+            "acquisitions": f"## M&A Transactions (raw)\n{_compact(market.acquisitions)}",
+            "risk_signals": f"## Risk Signals (raw)\n{_compact(signals.risk_signals)}",
+            "exit_signals": f"## Exit Signals\n{_compact(signals.exit_signals)}",
+        }
+
+        if graph_insights.engine:
+            sections["graph"] = f"## Graph Insights\n{_compact(graph_insights)}"
+
+        return sections
 
 
 class MemoAgent:
     """Generates the full investment memo in markdown."""
 
-    def generate(
+    async def generate(
         self,
         company: str,
         stage: str,
@@ -267,21 +333,43 @@ class MemoAgent:
         graph_insights: GraphInsights,
         preferences: str = "",
     ) -> str:
-        content = self._build_memo_prompt(company, stage, exit_type, core, market, signals, analysis, graph_insights)
-        instructions = MEMO_INSTRUCTIONS
-        if preferences and preferences.strip():
-            instructions += (
-                "\n\n---\n"
-                "ANALYST PREFERENCES — apply these adjustments to this memo:\n"
-                f"{preferences.strip()}\n"
-                "Honour these preferences while maintaining the required structure above."
-            )
+        content = self._build_memo_prompt(
+            company, stage, exit_type, core, market, signals, analysis, graph_insights, preferences,
+        )
         try:
-            return _call_freeform(instructions, content)
+            return await call_freeform(MEMO_INSTRUCTIONS, content)
         except Exception as e:
             logger.error(f"Memo generation failed: {e}")
             return f"# Investment Memo — {company}\n\n*Memo generation encountered an error: {e}*"
 
+    async def generate_stream(
+        self,
+        company: str,
+        stage: str,
+        exit_type: str,
+        core: CoreEntities,
+        market: MarketEntities,
+        signals: SignalEntities,
+        analysis: AnalysisOutput,
+        graph_insights: GraphInsights,
+        preferences: str = "",
+    ) -> AsyncIterator[str]:
+        """Same memo as generate(), yielded as text deltas while the model writes it."""
+        content = self._build_memo_prompt(
+            company, stage, exit_type, core, market, signals, analysis, graph_insights, preferences,
+        )
+        emitted = False
+        try:
+            async for delta in stream_freeform(MEMO_INSTRUCTIONS, content):
+                emitted = True
+                yield delta
+        except Exception as e:
+            logger.error(f"Memo streaming failed: {e}")
+            if emitted:
+                yield f"\n\n*Memo generation was interrupted: {e}*"
+            else:
+                yield f"# Investment Memo — {company}\n\n*Memo generation encountered an error: {e}*"
+
     def _build_memo_prompt(
         self,
         company: str,
@@ -292,22 +380,36 @@ class MemoAgent:
         signals: SignalEntities,
         analysis: AnalysisOutput,
         graph_insights: GraphInsights,
+        preferences: str = "",
     ) -> str:
+        """
+        Memo input. The instructions stay byte-identical on every run so the
+        provider can cache them as a prompt prefix; everything run-specific
+        lives here, the static note first and the analyst's preferences last.
+        """
         parts = [
-            f"Company: {company}\nLast funding round (infer stage from this): {core.funding.last_round or 'Unknown'}\nTotal raised: {core.funding.total_raised or 'Unknown'}\nNote: Determine the most appropriate stage classification (Seed/Series A/B/C/Growth/Public) and most likely exit path (IPO vs Strategic Acquisition) from the data — do not ask the user.\n",
-            f"## Company Profile\n{core.company.model_dump_json(indent=2)}",
-            f"## Funding\n{core.funding.model_dump_json(indent=2)}",
-            f"## Traction\n{core.traction.model_dump_json(indent=2)}",
-            f"## Founders\n{json.dumps([f.model_dump() for f in core.founders], indent=2)}",
-            f"## Investors\n{json.dumps([i.model_dump() for i in core.investors], indent=2)}",
-            f"## Market\n{market.market.model_dump_json(indent=2)}",
-            f"## Competitors\n{json.dumps([c.model_dump() for c in core.competitors], indent=2)}",
-            f"## M&A Comps\n{json.dumps([c.model_dump() for c in analysis.comps], indent=2)}",
-            f"## Red Flags\n{json.dumps([r.model_dump() for r in analysis.red_flags], indent=2)}",
-            f"## Exit Probability\n{analysis.exit_probability.model_dump_json(indent=2)}",
-            f"## Ranked Acquirers\n{json.dumps([a.model_dump() for a in analysis.ranked_acquirers], indent=2)}",
+            MEMO_INPUT_NOTE,
+            f"Company: {company}\nLast funding round (infer stage from this): {core.funding.last_round or 'Unknown'}\nTotal raised: {core.funding.total_raised or 'Unknown'}\n",
+            f"## Company Profile\n{_compact(core.company)}",
+            f"## Funding\n{_compact(core.funding)}",
+            f"## Traction\n{_compact(core.traction)}",
+            f"## Founders\n{_compact(core.founders)}",
+            f"## Investors\n{_compact(core.investors)}",
+            f"## Market\n{_compact(market.market)}",
+            f"## Competitors\n{_compact(core.competitors)}",
+            f"## M&A Comps\n{_compact(analysis.comps)}",
+            f"## Red Flags\n{_compact(analysis.red_flags)}",
+            f"## Exit Probability\n{_compact(analysis.exit_probability)}",
+            f"## Ranked Acquirers\n{_compact(analysis.ranked_acquirers)}",
             f"## Competitive Position: {analysis.competitive_position}",
         ]
-        if graph_insights.neo4j_available:
-            parts.append(f"## Graph Insights\n{json.dumps(graph_insights.model_dump(), indent=2)}")
+        if graph_insights.engine:
+            parts.append(f"## Graph Insights\n{_compact(graph_insights)}")
+        if preferences and preferences.strip():
+            parts.append(
+                "---\n"
+                "ANALYST PREFERENCES — apply these adjustments to this memo:\n"
+                f"{preferences.strip()}\n"
+                "Honour these preferences while maintaining the required structure in your instructions."
+            )
         return "\n\n".join(parts)
@@ -0,0 +1,238 @@
+import hashlib
+import heapq
+import logging
+import math
+import re
+from typing import Any, Dict, Iterable, List
+
+from config import (
+    OPENAI_MODEL,
+    CORPUS_BUDGET_CORE,
+    CORPUS_BUDGET_MARKET,
+    CORPUS_BUDGET_SIGNALS,
+    CORPUS_DEDUP_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+# Token budget per extraction schema
+BUDGETS = {
+    "core": CORPUS_BUDGET_CORE,
+    "market": CORPUS_BUDGET_MARKET,
+    "signals": CORPUS_BUDGET_SIGNALS,
+}
+
+# What each extraction is looking for — sources mentioning these rank higher
+INTENT_TERMS = {
+    "core": {
+        "founded", "founder", "founders", "ceo", "headquarters", "funding", "raised",
+        "series", "investors", "led", "valuation", "revenue", "arr", "customers",
+        "growth", "employees", "competitors", "alternatives",
+    },
+    "market": {
+        "acquired", "acquisition", "acquires", "acquirer", "merger", "deal", "market",
+        "size", "tam", "cagr", "billion", "valuation", "funding", "investors", "competitor",
+    },
+    "signals": {
+        "layoffs", "lawsuit", "controversy", "risk", "risks", "regulatory", "fine",
+        "partnership", "partners", "ipo", "spac", "exit", "acquisition", "strategy",
+        "decline", "churn", "investigation",
+    },
+}
+
+SEPARATOR = "\n---\n"
+SHINGLE_SIZE = 5          # words per shingle
+SKETCH_SIZE = 64          # hashes kept per bottom-k MinHash sketch
+MIN_PARTIAL_TOKENS = 200  # smallest tail worth filling with a truncated source
+
+_WORD = re.compile(r"\w+")
+
+
+# ── Token counting ────────────────────────────────────────────────────────────
+# tiktoken is optional: without it (or without its encoding files) counts fall
+# back to the usual ~4 characters per token estimate.
+
+_encoder = None
+_encoder_loaded = False
+
+
+def load_tokenizer():
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            try:
+                _encoder = tiktoken.encoding_for_model(OPENAI_MODEL)
+            except KeyError:
+                _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.info(f"tiktoken unavailable ({e}) — estimating tokens as chars/4")
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    encoder = load_tokenizer()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoder = load_tokenizer()
+    if encoder is not None:
+        return encoder.decode(encoder.encode(text, disallowed_special=())[:max_tokens])
+    return text[: max_tokens * 4]
+
+
+# ── Near-duplicate detection ──────────────────────────────────────────────────
+
+def _sketch(text: str) -> frozenset:
+    """
+    Bottom-k MinHash sketch of the text's word shingles: the SKETCH_SIZE
+    smallest shingle hashes. blake2b keeps hashes stable across processes,
+    so the same results always dedup the same way (and hit the LLM cache).
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles)
+    return frozenset(heapq.nsmallest(SKETCH_SIZE, hashes))
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Estimated Jaccard similarity of the two shingle sets behind the sketches."""
+    union = heapq.nsmallest(SKETCH_SIZE, a | b)
+    if not union:
+        return 0.0
+    return sum(1 for h in union if h in a and h in b) / len(union)
+
+
+# ── Relevance ─────────────────────────────────────────────────────────────────
+
+def _relevance(result: Dict[str, Any], schema: str, focus: List[str]) -> float:
+    """
+    Score a source for one extraction: mentions of the focus entities (the
+    target company counts double), coverage of the schema's intent terms,
+    and Tavily's own relevance score.
+    """
+    title = result.get("title", "").lower()
+    content = result.get("content", "").lower()
+    score = 0.0
+    for i, term in enumerate(focus):
+        weight = 2.0 if i == 0 else 1.0
+        if term in title:
+            score += 1.5 * weight
+        elif term in content:
+            score += weight
+    words = set(_WORD.findall(title + " " + content))
+    score += 0.5 * min(len(words & INTENT_TERMS.get(schema, set())), 6)
+    score += float(result.get("score") or 0.0)
+    if str(result.get("url", "")).startswith("tavily_answer_"):
+        score += 1.5  # synthesized answers are dense and on-topic by construction
+    return score
+
+
+# ── Corpus ────────────────────────────────────────────────────────────────────
+
+def _block(i: int, result: Dict[str, Any], content: str) -> str:
+    return f"[Source {i}] {result.get('title', '')}\n{result.get('url', '')}\n{content}\n"
+
+
+def build_corpus(
+    results: List[Dict[str, Any]],
+    schema: str,
+    focus: Iterable[str] = (),
+    budget: int | None = None,
+) -> str:
+    """
+    Turn raw Tavily results into the extraction prompt for `schema`:
+    drop repeated URLs and near-duplicate text (keeping the most relevant
+    copy), rank by relevance to `focus` and the schema's intent, then pack
+    sources in rank order into the schema's token budget. The first source
+    that doesn't fit is truncated into the remaining space when that space
+    is large enough to be useful.
+    """
+    budget = budget or BUDGETS.get(schema, CORPUS_BUDGET_CORE)
+    focus = [f.strip().lower() for f in focus if f and f.strip()]
+
+    seen_urls = set()
+    candidates = []
+    for index, r in enumerate(results):
+        url = r.get("url", "")
+        if url in seen_urls or not r.get("content"):
+            continue
+        seen_urls.add(url)
+        candidates.append((-_relevance(r, schema, focus), index, r))
+    candidates.sort(key=lambda c: (c[0], c[1]))
+
+    kept: List[Dict[str, Any]] = []
+    sketches: List[frozenset] = []
+    duplicates = 0
+    for _, _, r in candidates:
+        sketch = _sketch(r["content"])
+        if any(similarity(sketch, other) >= CORPUS_DEDUP_THRESHOLD for other in sketches):
+            duplicates += 1
+            continue
+        kept.append(r)
+        sketches.append(sketch)
+
+    parts: List[str] = []
+    used = 0
+    separator_tokens = count_tokens(SEPARATOR)
+    for r in kept:
+        overhead = separator_tokens if parts else 0
+        block = _block(len(parts) + 1, r, r["content"])
+        tokens = count_tokens(block)
+        if used + overhead + tokens <= budget:
+            parts.append(block)
+            used += overhead + tokens
+            continue
+        remaining = budget - used - overhead
+        if remaining >= MIN_PARTIAL_TOKENS:
+            header = count_tokens(_block(len(parts) + 1, r, ""))
+            content = truncate_to_tokens(r["content"], remaining - header)
+            block = _block(len(parts) + 1, r, content)
+            overshoot = count_tokens(block) - remaining
+            if overshoot > 0:  # BPE merges across the header/content boundary
+                content = truncate_to_tokens(content, remaining - header - overshoot)
+                block = _block(len(parts) + 1, r, content)
+            parts.append(block)
+            used += overhead + count_tokens(block)
+
+    logger.info(
+        f"Corpus '{schema}': {len(results)} results → {len(candidates)} unique URLs, "
+        f"{duplicates} near-duplicates, {len(parts)} packed ({used}/{budget} tokens)"
+    )
+    return SEPARATOR.join(parts)
+
+
+def split_corpus(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a packed corpus on source boundaries into chunks of roughly equal
+    size, each within max_tokens (a single oversized source gets a chunk of
+    its own). Returns [text] when the corpus already fits.
+    """
+    blocks = text.split(SEPARATOR)
+    sizes = [count_tokens(b) for b in blocks]
+    total = sum(sizes)
+    if total <= max_tokens or len(blocks) == 1:
+        return [text]
+
+    # Assign each source to the chunk its midpoint falls in, so chunks come
+    # out near-equal; add a chunk if any multi-source chunk still overflows.
+    for n in range(math.ceil(total / max_tokens), len(blocks) + 1):
+        target = total / n
+        chunks: List[List[str]] = [[] for _ in range(n)]
+        chunk_sizes = [0] * n
+        start = 0
+        for block, size in zip(blocks, sizes):
+            i = min(n - 1, int((start + size / 2) / target))
+            chunks[i].append(block)
+            chunk_sizes[i] += size
+            start += size
+        if all(size <= max_tokens or len(c) == 1 for c, size in zip(chunks, chunk_sizes)):
+            break
+    return [SEPARATOR.join(c) for c in chunks if c]
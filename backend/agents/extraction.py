@@ -1,14 +1,15 @@
-import json
+import asyncio
 import logging
-from typing import Any, Dict, List
-from openai import OpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL
+import re
+from typing import Any, Callable, Dict, List, Tuple, Type, TypeVar
+from pydantic import BaseModel
+from agents.corpus import split_corpus
+from agents.llm import call_structured
+from config import EXTRACTION_CHUNKING, EXTRACTION_CHUNK_TOKENS
 from schemas.core import CoreEntities, MarketEntities, SignalEntities
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 # ── JSON Schemas for structured extraction ────────────────────────────────────
 
 CORE_SCHEMA = {
@@ -195,80 +196,92 @@ SIGNAL_SCHEMA = {
 }
 
 
-# ── API helpers ───────────────────────────────────────────────────────────────
+# ── Merging partial extractions ───────────────────────────────────────────────
+# Chunked extraction yields one partial entity bundle per chunk. Chunks are in
+# corpus rank order, so for scalar fields the first non-empty value wins;
+# booleans are OR-ed, string lists are unioned, and entity lists are unioned
+# on an identity key with duplicates merged field by field.
 
-def _call_structured(instructions: str, content: str, schema: dict, schema_name: str) -> dict:
-    """
-    Call OpenAI and return parsed JSON.
-    Tries the Responses API first; falls back to Chat Completions.
-    """
-    # Responses API rejects empty input — substitute a placeholder so extraction
-    # returns an empty-but-valid structure rather than raising an error.
-    safe_content = content.strip() if content else ""
-    if not safe_content:
-        safe_content = "No research data was available for this query."
+M = TypeVar("M", bound=BaseModel)
 
-    try:
-        response = client.responses.create(
-            model=OPENAI_MODEL,
-            instructions=instructions,
-            input=safe_content,
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": schema_name,
-                    "schema": schema,
-                    "strict": True,
-                }
-            },
-        )
-        return json.loads(response.output_text)
-    except Exception as e:
-        logger.warning(f"Responses API failed ({e}), falling back to Chat Completions")
 
-    # Fallback: Chat Completions with JSON schema response format
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": content},
-        ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": schema_name,
-                "schema": schema,
-                "strict": True,
-            },
-        },
-    )
-    return json.loads(response.choices[0].message.content)
+def _norm(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return " ".join(re.sub(r"[^\w\s]", " ", str(value).lower()).split())
 
 
-def _call_freeform(instructions: str, content: str, effort: str = "high") -> str:
-    """
-    Call OpenAI for free-form text output (investment memo).
-    Tries Responses API first, then falls back to Chat Completions.
-    """
-    safe_content = content.strip() if content else "No research data was available."
-    try:
-        response = client.responses.create(
-            model=OPENAI_MODEL,
-            instructions=instructions,
-            input=safe_content,
-        )
-        return response.output_text
-    except Exception as e:
-        logger.warning(f"Responses API (freeform) failed ({e}), falling back to Chat Completions")
+def _same_key(a: Tuple, b: Tuple) -> bool:
+    """Keys match when every known component agrees — a missing year on one
+    side still matches the same (target, acquirer) with a year on the other."""
+    return all(x == y or x is None or y is None for x, y in zip(a, b))
+
+
+def _union_strings(a: List[str], b: List[str]) -> List[str]:
+    seen = {_norm(x) for x in a}
+    out = list(a)
+    for x in b:
+        if _norm(x) not in seen:
+            seen.add(_norm(x))
+            out.append(x)
+    return out
+
+
+def _union_entities(a: List[M], b: List[M], key: Callable[[M], Tuple]) -> List[M]:
+    out = list(a)
+    for item in b:
+        k = key(item)
+        for i, existing in enumerate(out):
+            if k[0] and _same_key(key(existing), k):
+                out[i] = _fill(existing, item)
+                break
+        else:
+            out.append(item)
+    return out
+
 
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": content},
-        ],
-    )
-    return response.choices[0].message.content
+def _fill(base: M, other: M, keys: Dict[str, Callable] | None = None) -> M:
+    """Merge `other` into `base`, field by field."""
+    keys = keys or {}
+    updates = {}
+    for name in type(base).model_fields:
+        a, b = getattr(base, name), getattr(other, name)
+        if name in keys:
+            updates[name] = _union_entities(a, b, keys[name])
+        elif isinstance(a, BaseModel):
+            updates[name] = _fill(a, b)
+        elif isinstance(a, list):
+            updates[name] = _union_strings(a, b)
+        elif isinstance(a, bool):
+            # Flags like is_lead are only ever asserted — any chunk saying so wins
+            updates[name] = a or b
+        elif a is None or a == "":
+            # Only fill genuinely empty values — a schema default like
+            # overlap_type="direct" is also a real answer from the model
+            updates[name] = b
+    return base.model_copy(update=updates)
+
+
+CORE_KEYS = {
+    "founders": lambda f: (_norm(f.name),),
+    "investors": lambda i: (_norm(i.name),),
+    "competitors": lambda c: (_norm(c.name),),
+}
+MARKET_KEYS = {
+    "acquisitions": lambda a: (_norm(a.target), _norm(a.acquirer), a.year),
+    "competitor_details": lambda c: (_norm(c.name),),
+}
+SIGNAL_KEYS = {
+    "risk_signals": lambda r: (_norm(r.signal),),
+    "partnerships": lambda p: (_norm(p.partner),),
+}
+
+
+def merge_entities(parts: List[M], keys: Dict[str, Callable]) -> M:
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = _fill(merged, part, keys)
+    return merged
 
 
 # ── ExtractionAgent ───────────────────────────────────────────────────────────
@@ -277,7 +290,42 @@ class ExtractionAgent:
     """Converts raw research text into structured entity objects.
     All three extraction methods use strict JSON schemas to prevent hallucination."""
 
-    def extract_core(self, raw_text: str) -> CoreEntities:
+    async def _extract(
+        self,
+        instructions: str,
+        raw_text: str,
+        schema: dict,
+        schema_name: str,
+        model: Type[M],
+        keys: Dict[str, Callable],
+    ) -> M:
+        """
+        Run one schema extraction. Corpora over EXTRACTION_CHUNK_TOKENS are
+        split on source boundaries and the chunks extracted concurrently
+        (map), then merged with entity-level dedup (reduce) — latency tracks
+        the largest chunk rather than the whole corpus. A failed chunk only
+        loses its own sources.
+        """
+        chunks = split_corpus(raw_text, EXTRACTION_CHUNK_TOKENS) if EXTRACTION_CHUNKING else [raw_text]
+        if len(chunks) == 1:
+            return model(**await call_structured(instructions, raw_text, schema, schema_name))
+
+        async def extract_chunk(chunk: str) -> M:
+            return model(**await call_structured(instructions, chunk, schema, schema_name))
+
+        results = await asyncio.gather(*(extract_chunk(c) for c in chunks), return_exceptions=True)
+        parts = []
+        for i, result in enumerate(results, 1):
+            if isinstance(result, BaseException):
+                logger.warning(f"{schema_name} chunk {i}/{len(chunks)} failed: {result}")
+            else:
+                parts.append(result)
+        if not parts:
+            raise results[0]
+        logger.info(f"{schema_name}: merged {len(parts)}/{len(chunks)} chunks")
+        return merge_entities(parts, keys)
+
+    async def extract_core(self, raw_text: str) -> CoreEntities:
         instructions = (
             "You are a precise VC research assistant. Extract all available information "
             "about the company from the research text below. If a field is unknown, use "
@@ -285,36 +333,31 @@ class ExtractionAgent:
             "evidence-based."
         )
         try:
-            data = _call_structured(instructions, raw_text, CORE_SCHEMA, "core_extraction")
-            return CoreEntities(**data)
+            return await self._extract(instructions, raw_text, CORE_SCHEMA, "core_extraction", CoreEntities, CORE_KEYS)
         except Exception as e:
             logger.error(f"Core extraction failed: {e}")
             return CoreEntities()
 
-    def extract_market(self, raw_text: str) -> MarketEntities:
+    async def extract_market(self, raw_text: str) -> MarketEntities:
         instructions = (
             "You are a VC research assistant specializing in market intelligence and M&A. "
             "Extract market data, M&A comparable transactions, and competitor funding details "
             "from the research text. Include every acquisition mentioned with deal size if available."
         )
         try:
-            data = _call_structured(instructions, raw_text, MARKET_SCHEMA, "market_extraction")
-            return MarketEntities(**data)
+            return await self._extract(instructions, raw_text, MARKET_SCHEMA, "market_extraction", MarketEntities, MARKET_KEYS)
         except Exception as e:
             logger.error(f"Market extraction failed: {e}")
             return MarketEntities()
 
-    def extract_signals(self, raw_text: str) -> dict:
-        from schemas.core import SignalEntities
+    async def extract_signals(self, raw_text: str) -> SignalEntities:
         instructions = (
             "You are a risk analyst. Extract risk signals, strategic partnerships, and exit "
             "indicators from the research text. Be thorough — include subtle signals like "
             "leadership changes, burn rate concerns, and market timing risks."
         )
         try:
-            data = _call_structured(instructions, raw_text, SIGNAL_SCHEMA, "signal_extraction")
-            return SignalEntities(**data)
+            return await self._extract(instructions, raw_text, SIGNAL_SCHEMA, "signal_extraction", SignalEntities, SIGNAL_KEYS)
         except Exception as e:
             logger.error(f"Signal extraction failed: {e}")
-            from schemas.core import SignalEntities
             return SignalEntities()
@@ -1,18 +1,245 @@
 import logging
-from typing import Dict, Any
+import time
+from typing import Any, Dict, List, Tuple
 from schemas.core import CoreEntities, MarketEntities, SignalEntities
 from schemas.outputs import GraphInsights
 from config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, NEO4J_ENABLED
+from metrics import NEO4J_SECONDS, timed
 
 logger = logging.getLogger(__name__)
 
+# ── Batched write statements ──────────────────────────────────────────────────
+# Each entity class is written by a single UNWIND statement so graph build
+# costs a fixed number of round trips regardless of how many entities exist.
+# $company_name / $market_name are passed to every statement.
+
+_WRITE_COMPANY = """
+MERGE (c:Company {name: $company_name})
+SET c.sector = $row.sector,
+    c.sub_sector = $row.sub_sector,
+    c.founded_year = $row.founded_year,
+    c.hq = $row.hq,
+    c.description = $row.description,
+    c.total_funding = $row.total_funding,
+    c.estimated_revenue = $row.estimated_revenue,
+    c.is_target = true
+"""
+
+_WRITE_MARKET = """
+MERGE (m:Market {name: $market_name})
+SET m.tam = $row.tam, m.growth_rate = $row.growth_rate
+WITH m
+MATCH (c:Company {name: $company_name})
+MERGE (c)-[:OPERATES_IN]->(m)
+"""
+
+_WRITE_FOUNDERS = """
+UNWIND $rows AS row
+MERGE (p:Person {name: row.name})
+SET p.role = row.role, p.background = row.background
+WITH p, row
+MATCH (c:Company {name: $company_name})
+MERGE (p)-[:FOUNDED]->(c)
+MERGE (p)-[:LEADS {role: row.role}]->(c)
+FOREACH (prior IN row.prior_companies |
+    MERGE (prev:Company {name: prior})
+    MERGE (p)-[:PREVIOUSLY_AT]->(prev)
+)
+"""
+
+_WRITE_INVESTORS = """
+UNWIND $rows AS row
+MERGE (inv:Investor {name: row.name})
+SET inv.type = row.type
+WITH inv, row
+MATCH (c:Company {name: $company_name})
+MERGE (inv)-[:INVESTED_IN {is_lead: row.is_lead}]->(c)
+"""
+
+_WRITE_COMPETITORS = """
+UNWIND $rows AS row
+MERGE (comp:Company {name: row.name})
+SET comp.estimated_funding = row.estimated_funding
+WITH comp, row
+MATCH (target:Company {name: $company_name})
+MERGE (target)-[:COMPETES_WITH {overlap: row.overlap}]->(comp)
+"""
+
+# Competitor investors create the cross-portfolio overlap edges
+_WRITE_COMPETITOR_INVESTORS = """
+UNWIND $rows AS row
+MERGE (inv:Investor {name: row.investor})
+MERGE (comp:Company {name: row.company})
+MERGE (inv)-[:INVESTED_IN]->(comp)
+"""
+
+# Acquired targets are also linked to the target's market, when known
+_WRITE_ACQUISITIONS = """
+UNWIND $rows AS row
+MERGE (tgt:Company {name: row.target})
+MERGE (acq:Company {name: row.acquirer})
+MERGE (acq)-[r:ACQUIRED]->(tgt)
+SET r.year = CASE WHEN row.year IS NOT NULL THEN row.year ELSE r.year END,
+    r.deal_size = CASE WHEN row.deal_size IS NOT NULL THEN row.deal_size ELSE r.deal_size END,
+    r.implied_multiple = CASE WHEN row.implied_multiple IS NOT NULL THEN row.implied_multiple ELSE r.implied_multiple END
+FOREACH (ignored IN CASE WHEN $market_name <> '' THEN [1] ELSE [] END |
+    MERGE (m:Market {name: $market_name})
+    MERGE (tgt)-[:OPERATES_IN]->(m)
+)
+"""
+
+_WRITE_PARTNERSHIPS = """
+UNWIND $rows AS row
+MERGE (partner:Company {name: row.partner})
+WITH partner, row
+MATCH (c:Company {name: $company_name})
+MERGE (c)-[:PARTNERS_WITH {type: row.type}]->(partner)
+"""
+
+
+# ── Shared driver + schema bootstrap ─────────────────────────────────────────
+# Created once in the app lifespan; GraphAgent falls back to a private driver
+# when the app hasn't initialised one (e.g. scripts and benchmarks).
+
+driver = None
+
+# Idempotent — every MERGE in this module looks nodes up by name, so each
+# label gets a uniqueness constraint (which also backs an index).
+_SCHEMA_STATEMENTS = [
+    ("constraint", "company_name_unique",
+     "CREATE CONSTRAINT company_name_unique IF NOT EXISTS FOR (c:Company) REQUIRE c.name IS UNIQUE"),
+    ("constraint", "investor_name_unique",
+     "CREATE CONSTRAINT investor_name_unique IF NOT EXISTS FOR (i:Investor) REQUIRE i.name IS UNIQUE"),
+    ("constraint", "person_name_unique",
+     "CREATE CONSTRAINT person_name_unique IF NOT EXISTS FOR (p:Person) REQUIRE p.name IS UNIQUE"),
+    ("constraint", "market_name_unique",
+     "CREATE CONSTRAINT market_name_unique IF NOT EXISTS FOR (m:Market) REQUIRE m.name IS UNIQUE"),
+    ("index", "company_sector",
+     "CREATE INDEX company_sector IF NOT EXISTS FOR (c:Company) ON (c.sector)"),
+    ("index", "company_is_target",
+     "CREATE INDEX company_is_target IF NOT EXISTS FOR (c:Company) ON (c.is_target)"),
+]
+
+schema_state: Dict[str, Any] = {"bootstrapped": False, "statements": {}, "indexes": {}}
+
+
+async def init_driver():
+    global driver
+    if not NEO4J_ENABLED:
+        logger.info("Neo4j not configured — graph runs in local mode")
+        return
+    try:
+        import neo4j
+        driver = neo4j.AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        await driver.verify_connectivity()
+        await bootstrap_schema()
+        logger.info("Neo4j driver initialised")
+    except Exception as e:
+        logger.warning(f"Neo4j init failed — graph runs in local mode: {e}")
+        if driver:
+            await driver.close()
+        driver = None
+
+
+async def bootstrap_schema():
+    """Create constraints/indexes if missing and record what the server reports."""
+    statements = {}
+    async with driver.session() as session:
+        for kind, name, statement in _SCHEMA_STATEMENTS:
+            try:
+                result = await session.run(statement)
+                await result.consume()
+                statements[name] = "ok"
+            except Exception as e:
+                # e.g. duplicate names already in the graph block a uniqueness constraint
+                logger.warning(f"Neo4j schema {kind} '{name}' failed: {e}")
+                statements[name] = f"error: {e}"
+
+        indexes = {}
+        try:
+            result = await session.run(
+                "SHOW INDEXES YIELD name, state, populationPercent, owningConstraint"
+            )
+            async for r in result:
+                if r["name"] in statements or r["owningConstraint"] in statements:
+                    indexes[r["name"]] = {"state": r["state"], "population": r["populationPercent"]}
+        except Exception as e:
+            logger.warning(f"SHOW INDEXES failed: {e}")
+
+    schema_state.update(
+        bootstrapped=all(v == "ok" for v in statements.values()),
+        statements=statements,
+        indexes=indexes,
+    )
+    logger.info(f"Neo4j schema bootstrap: {statements}")
+
+
+async def close_driver():
+    global driver
+    if driver:
+        await driver.close()
+        driver = None
+
+
+# ── Analysis query ────────────────────────────────────────────────────────────
+# Everything run_analysis_queries needs in one round trip. The graph stats
+# are per-label counts, which Neo4j answers from its count store instead of
+# scanning every node; the three company-scoped reads run as subqueries.
+
+_STAT_LABELS = [
+    ("companies", "Company"),
+    ("investors", "Investor"),
+    ("people", "Person"),
+    ("markets", "Market"),
+]
+
+_ANALYSIS_QUERY = """
+CALL { MATCH (n:Company) RETURN COUNT(n) AS companies }
+CALL { MATCH (n:Investor) RETURN COUNT(n) AS investors }
+CALL { MATCH (n:Person) RETURN COUNT(n) AS people }
+CALL { MATCH (n:Market) RETURN COUNT(n) AS markets }
+OPTIONAL MATCH (target:Company {name: $name})
+
+// 1. Investor overlap with competitors
+CALL {
+    WITH target
+    MATCH (target)<-[:INVESTED_IN]-(inv:Investor)-[:INVESTED_IN]->(comp:Company)
+    WHERE (target)-[:COMPETES_WITH]-(comp)
+    WITH inv, COLLECT(DISTINCT comp.name) AS also_backs
+    RETURN COLLECT({investor: inv.name, also_backs: also_backs}) AS investor_overlaps
+}
+
+// 2. Top acquirers in same market
+CALL {
+    WITH target
+    MATCH (target)-[:OPERATES_IN]->(:Market)<-[:OPERATES_IN]-(t:Company)<-[:ACQUIRED]-(a:Company)
+    WITH a, COUNT(DISTINCT t) AS deal_count, COLLECT(DISTINCT t.name) AS targets_acquired
+    ORDER BY deal_count DESC
+    LIMIT 5
+    RETURN COLLECT({acquirer: a.name, deal_count: deal_count, targets_acquired: targets_acquired}) AS top_acquirers
+}
+
+// 3. Competitive density
+CALL {
+    WITH target
+    OPTIONAL MATCH (target)-[:COMPETES_WITH]-(comp:Company)
+    RETURN COUNT(DISTINCT comp) AS competitor_count
+}
+
+RETURN companies, investors, people, markets,
+       investor_overlaps, top_acquirers, competitor_count
+"""
+
 
 class GraphAgent:
     """Builds the Neo4j relationship graph and runs analytical queries."""
 
     def __init__(self):
-        self.driver = None
-        if NEO4J_ENABLED:
+        self.driver = driver
+        self._owns_driver = False
+        self.write_timings: Dict[str, float] = {}
+        if self.driver is None and NEO4J_ENABLED:
+            self._owns_driver = True
             try:
                 import neo4j
                 self.driver = neo4j.AsyncGraphDatabase.driver(
@@ -24,7 +251,7 @@ class GraphAgent:
                 self.driver = None
 
     async def close(self):
-        if self.driver:
+        if self.driver and self._owns_driver:
             await self.driver.close()
 
     async def build_graph(
@@ -37,237 +264,118 @@ class GraphAgent:
             logger.info("Neo4j not available — skipping graph construction")
             return
 
-        # Verify credentials before attempting writes
-        try:
-            await self.driver.verify_connectivity()
-        except Exception as e:
-            logger.warning(f"Neo4j connectivity check failed: {e} — disabling Neo4j")
-            self.driver = None
-            return
+        # Verify credentials before attempting writes (the shared driver was verified at startup)
+        if self._owns_driver:
+            try:
+                await self.driver.verify_connectivity()
+            except Exception as e:
+                logger.warning(f"Neo4j connectivity check failed: {e} — disabling Neo4j")
+                await self.driver.close()
+                self.driver = None
+                return
 
-        try:
-            async with self.driver.session() as session:
-                company_name = core.company.name
-
-                # Target company
-                await session.run(
-                    """
-                    MERGE (c:Company {name: $name})
-                    SET c.sector = $sector,
-                        c.sub_sector = $sub_sector,
-                        c.founded_year = $founded_year,
-                        c.hq = $hq,
-                        c.description = $description,
-                        c.total_funding = $total_funding,
-                        c.estimated_revenue = $estimated_revenue,
-                        c.is_target = true
-                    """,
-                    name=company_name,
-                    sector=core.company.sector,
-                    sub_sector=core.company.sub_sector,
-                    founded_year=core.company.founded_year,
-                    hq=core.company.hq_location,
-                    description=core.company.description,
-                    total_funding=core.funding.total_raised,
-                    estimated_revenue=core.traction.estimated_revenue,
-                )
+        company_name = core.company.name
+        market_name = market.market.name
+        batches = self._write_batches(core, market, signals)
+
+        async def write_all(tx):
+            timings = {}
+            for entity_class, query, params in batches:
+                t = time.perf_counter()
+                result = await tx.run(query, company_name=company_name, market_name=market_name, **params)
+                await result.consume()
+                timings[entity_class] = round((time.perf_counter() - t) * 1000, 1)
+            return timings
 
-                # Market node + OPERATES_IN
-                if market.market.name:
-                    await session.run(
-                        """
-                        MERGE (m:Market {name: $name})
-                        SET m.tam = $tam, m.growth_rate = $growth_rate
-                        WITH m
-                        MATCH (c:Company {name: $company_name})
-                        MERGE (c)-[:OPERATES_IN]->(m)
-                        """,
-                        name=market.market.name,
-                        tam=market.market.tam,
-                        growth_rate=market.market.growth_rate,
-                        company_name=company_name,
-                    )
-
-                # Founders
-                for founder in core.founders:
-                    await session.run(
-                        """
-                        MERGE (p:Person {name: $name})
-                        SET p.role = $role, p.background = $background
-                        WITH p
-                        MATCH (c:Company {name: $company_name})
-                        MERGE (p)-[:FOUNDED]->(c)
-                        MERGE (p)-[:LEADS {role: $role}]->(c)
-                        """,
-                        name=founder.name,
-                        role=founder.role,
-                        background=founder.background,
-                        company_name=company_name,
-                    )
-                    for prior in founder.prior_companies:
-                        if prior:
-                            await session.run(
-                                """
-                                MERGE (prev:Company {name: $prior})
-                                WITH prev
-                                MATCH (p:Person {name: $founder_name})
-                                MERGE (p)-[:PREVIOUSLY_AT]->(prev)
-                                """,
-                                prior=prior,
-                                founder_name=founder.name,
-                            )
-
-                # Investors
-                for investor in core.investors:
-                    await session.run(
-                        """
-                        MERGE (inv:Investor {name: $name})
-                        SET inv.type = $type
-                        WITH inv
-                        MATCH (c:Company {name: $company_name})
-                        MERGE (inv)-[:INVESTED_IN {is_lead: $is_lead}]->(c)
-                        """,
-                        name=investor.name,
-                        type=investor.type,
-                        is_lead=investor.is_lead,
-                        company_name=company_name,
-                    )
-
-                # Competitors + COMPETES_WITH
-                for comp in core.competitors:
-                    await session.run(
-                        """
-                        MERGE (comp:Company {name: $name})
-                        SET comp.estimated_funding = $estimated_funding
-                        WITH comp
-                        MATCH (target:Company {name: $target_name})
-                        MERGE (target)-[:COMPETES_WITH {overlap: $overlap}]->(comp)
-                        """,
-                        name=comp.name,
-                        estimated_funding=comp.estimated_funding,
-                        target_name=company_name,
-                        overlap=comp.overlap_type,
-                    )
-
-                # Competitor investors (creates cross-portfolio overlap edges)
-                for cd in market.competitor_details:
-                    for inv_name in cd.key_investors:
-                        if inv_name:
-                            await session.run(
-                                """
-                                MERGE (inv:Investor {name: $inv_name})
-                                WITH inv
-                                MERGE (comp:Company {name: $comp_name})
-                                MERGE (inv)-[:INVESTED_IN]->(comp)
-                                """,
-                                inv_name=inv_name,
-                                comp_name=cd.name,
-                            )
-
-                # M&A transactions
-                for acq in market.acquisitions:
-                    if acq.target and acq.acquirer:
-                        await session.run(
-                            """
-                            MERGE (tgt:Company {name: $target})
-                            MERGE (acq:Company {name: $acquirer})
-                            MERGE (acq)-[r:ACQUIRED]->(tgt)
-                            SET r.year = CASE WHEN $year IS NOT NULL THEN $year ELSE r.year END,
-                                r.deal_size = CASE WHEN $deal_size IS NOT NULL THEN $deal_size ELSE r.deal_size END,
-                                r.implied_multiple = CASE WHEN $implied_multiple IS NOT NULL THEN $implied_multiple ELSE r.implied_multiple END
-                            """,
-                            target=acq.target,
-                            acquirer=acq.acquirer,
-                            year=acq.year,
-                            deal_size=acq.deal_size,
-                            implied_multiple=acq.implied_multiple,
-                        )
-                        # Link acquired target to market
-                        if market.market.name:
-                            await session.run(
-                                """
-                                MATCH (tgt:Company {name: $target})
-                                MERGE (m:Market {name: $market_name})
-                                MERGE (tgt)-[:OPERATES_IN]->(m)
-                                """,
-                                target=acq.target,
-                                market_name=market.market.name,
-                            )
-
-                # Partnerships
-                for p in signals.partnerships:
-                    if p.partner:
-                        await session.run(
-                            """
-                            MERGE (partner:Company {name: $partner})
-                            WITH partner
-                            MATCH (c:Company {name: $company_name})
-                            MERGE (c)-[:PARTNERS_WITH {type: $type}]->(partner)
-                            """,
-                            partner=p.partner,
-                            type=p.type,
-                            company_name=company_name,
-                        )
-
-                logger.info(f"Graph built for '{company_name}'")
+        try:
+            t = time.perf_counter()
+            with timed(NEO4J_SECONDS, operation="write"):
+                async with self.driver.session() as session:
+                    self.write_timings = await session.execute_write(write_all)
+            self.write_timings["total"] = round((time.perf_counter() - t) * 1000, 1)
+            logger.info(f"Graph built for '{company_name}' — write latency (ms): {self.write_timings}")
         except Exception as e:
             logger.warning(f"Neo4j graph build failed: {e} — continuing without graph")
             self.driver = None
 
+    @staticmethod
+    def _write_batches(
+        core: CoreEntities,
+        market: MarketEntities,
+        signals: SignalEntities,
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """One parameterised statement per entity class; empty classes are skipped."""
+        batches: List[Tuple[str, str, Dict[str, Any]]] = [
+            ("company", _WRITE_COMPANY, {"row": {
+                "sector": core.company.sector,
+                "sub_sector": core.company.sub_sector,
+                "founded_year": core.company.founded_year,
+                "hq": core.company.hq_location,
+                "description": core.company.description,
+                "total_funding": core.funding.total_raised,
+                "estimated_revenue": core.traction.estimated_revenue,
+            }}),
+        ]
+        if market.market.name:
+            batches.append(("market", _WRITE_MARKET, {"row": {
+                "tam": market.market.tam,
+                "growth_rate": market.market.growth_rate,
+            }}))
+
+        rows_by_class = [
+            ("founders", _WRITE_FOUNDERS, [
+                {"name": f.name, "role": f.role, "background": f.background,
+                 "prior_companies": [p for p in f.prior_companies if p]}
+                for f in core.founders
+            ]),
+            ("investors", _WRITE_INVESTORS, [
+                {"name": i.name, "type": i.type, "is_lead": i.is_lead}
+                for i in core.investors
+            ]),
+            ("competitors", _WRITE_COMPETITORS, [
+                {"name": c.name, "estimated_funding": c.estimated_funding, "overlap": c.overlap_type}
+                for c in core.competitors
+            ]),
+            ("competitor_investors", _WRITE_COMPETITOR_INVESTORS, [
+                {"investor": inv_name, "company": cd.name}
+                for cd in market.competitor_details
+                for inv_name in cd.key_investors if inv_name
+            ]),
+            ("acquisitions", _WRITE_ACQUISITIONS, [
+                {"target": a.target, "acquirer": a.acquirer, "year": a.year,
+                 "deal_size": a.deal_size, "implied_multiple": a.implied_multiple}
+                for a in market.acquisitions if a.target and a.acquirer
+            ]),
+            ("partnerships", _WRITE_PARTNERSHIPS, [
+                {"partner": p.partner, "type": p.type}
+                for p in signals.partnerships if p.partner
+            ]),
+        ]
+        for entity_class, query, rows in rows_by_class:
+            if rows:
+                batches.append((entity_class, query, {"rows": rows}))
+        return batches
+
     async def run_analysis_queries(self, company_name: str) -> GraphInsights:
         if not self.driver:
             return GraphInsights(neo4j_available=False)
 
-        insights = GraphInsights(neo4j_available=True)
+        insights = GraphInsights(neo4j_available=True, engine="neo4j")
 
         try:
-            async with self.driver.session() as session:
-                # 1. Investor overlap with competitors
-                result = await session.run(
-                    """
-                    MATCH (target:Company {name: $name})<-[:INVESTED_IN]-(inv:Investor)
-                          -[:INVESTED_IN]->(comp:Company)
-                    WHERE (target)-[:COMPETES_WITH]-(comp)
-                    RETURN inv.name AS investor,
-                           COLLECT(DISTINCT comp.name) AS also_backs
-                    """,
-                    name=company_name,
-                )
-                insights.investor_overlaps = [dict(r) async for r in result]
-
-                # 2. Top acquirers in same market
-                result = await session.run(
-                    """
-                    MATCH (target:Company {name: $name})-[:OPERATES_IN]->(m:Market)
-                          <-[:OPERATES_IN]-(t:Company)<-[:ACQUIRED]-(a:Company)
-                    RETURN a.name AS acquirer,
-                           COUNT(DISTINCT t) AS deal_count,
-                           COLLECT(DISTINCT t.name) AS targets_acquired
-                    ORDER BY deal_count DESC
-                    LIMIT 5
-                    """,
-                    name=company_name,
-                )
-                insights.top_acquirers = [dict(r) async for r in result]
-
-                # 3. Competitive density
-                result = await session.run(
-                    """
-                    MATCH (target:Company {name: $name})-[:COMPETES_WITH]-(comp:Company)
-                    RETURN COUNT(DISTINCT comp) AS competitor_count
-                    """,
-                    name=company_name,
-                )
-                record = await result.single()
-                insights.competitive_density = dict(record) if record else {}
-
-                # 4. Graph stats
-                result = await session.run(
-                    "MATCH (n) RETURN labels(n)[0] AS label, COUNT(n) AS count"
-                )
-                insights.graph_stats = {r["label"]: r["count"] async for r in result}
+            with timed(NEO4J_SECONDS, operation="query"):
+                async with self.driver.session() as session:
+                    result = await session.run(_ANALYSIS_QUERY, name=company_name)
+                    record = await result.single()
         except Exception as e:
             logger.warning(f"Neo4j queries failed: {e} — returning empty insights")
             return GraphInsights(neo4j_available=False)
 
+        if record:
+            insights.investor_overlaps = [dict(r) for r in record["investor_overlaps"]]
+            insights.top_acquirers = [dict(r) for r in record["top_acquirers"]]
+            insights.competitive_density = {"competitor_count": record["competitor_count"]}
+            insights.graph_stats = {
+                label: record[key] for key, label in _STAT_LABELS if record[key]
+            }
         return insights
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+from config import GRAPH_SEED_LIMIT, GRAPH_MAX_COMPANIES
+from schemas.core import CoreEntities, MarketEntities, SignalEntities
+from schemas.outputs import GraphInsights
+
+logger = logging.getLogger(__name__)
+
+# Node labels and relationship types mirror the Neo4j model in agents/graph.py
+LABELS = ("Company", "Investor", "Person", "Market")
+
+
+class GraphStore:
+    """
+    In-process relationship graph. Nodes are interned to dense integer ids
+    (one id space, with a parallel label/name array), and each relationship
+    type keeps integer-indexed outgoing and incoming adjacency sets. Writes
+    are idempotent the same way Cypher MERGE is — nodes are looked up by
+    (label, name) — so re-running a company never duplicates anything.
+
+    Size is capped by analysed company: the entities behind each one are
+    kept in LRU order, and once more than max_companies are held the least
+    recently used tenth is dropped and the index rebuilt from the rest.
+    """
+
+    def __init__(self, max_companies: int = GRAPH_MAX_COMPANIES):
+        self.max_companies = max_companies
+        self.sources: OrderedDict[str, Tuple[str, Any]] = OrderedDict()
+        self.evicted = 0
+        self._reset()
+
+    def _reset(self):
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.labels: List[str] = []
+        self.names: List[str] = []
+        self.out: Dict[str, List[Set[int]]] = defaultdict(list)
+        self.inc: Dict[str, List[Set[int]]] = defaultdict(list)
+        self.label_counts: Counter = Counter()
+
+    def node(self, label: str, name: str) -> int:
+        key = (label, name)
+        node_id = self.ids.get(key)
+        if node_id is None:
+            node_id = len(self.names)
+            self.ids[key] = node_id
+            self.labels.append(label)
+            self.names.append(name)
+            self.label_counts[label] += 1
+        return node_id
+
+    def find(self, label: str, name: str) -> int | None:
+        return self.ids.get((label, name))
+
+    def _adjacency(self, table: Dict[str, List[Set[int]]], rel: str) -> List[Set[int]]:
+        adjacency = table[rel]
+        if len(adjacency) < len(self.names):
+            adjacency.extend(set() for _ in range(len(self.names) - len(adjacency)))
+        return adjacency
+
+    def link(self, src: int, rel: str, dst: int):
+        self._adjacency(self.out, rel)[src].add(dst)
+        self._adjacency(self.inc, rel)[dst].add(src)
+
+    def outgoing(self, node_id: int, rel: str) -> Set[int]:
+        adjacency = self.out.get(rel)
+        return adjacency[node_id] if adjacency and node_id < len(adjacency) else set()
+
+    def incoming(self, node_id: int, rel: str) -> Set[int]:
+        adjacency = self.inc.get(rel)
+        return adjacency[node_id] if adjacency and node_id < len(adjacency) else set()
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def add_entities(self, core: CoreEntities, market: MarketEntities, signals: SignalEntities):
+        """Same nodes and edges GraphAgent.build_graph writes to Neo4j."""
+        self._remember(core.company.name, ("run", (core, market, signals)))
+        self._write_entities(core, market, signals)
+
+    def add_saved_result(self, company_name: str, result: dict):
+        """
+        Seed from a saved analysis. Its result holds only what the frontend
+        persisted, so this recovers the company's market, its M&A comps and
+        the investor/competitor overlaps — enough for acquirer frequency and
+        overlap queries on later companies in the same market.
+        """
+        self._remember(company_name, ("saved", result))
+        self._write_saved_result(company_name, result)
+
+    def _remember(self, company_name: str, source: Tuple[str, Any]):
+        """Record the latest entities for a company and evict past the cap."""
+        self.sources[company_name] = source
+        self.sources.move_to_end(company_name)
+        if len(self.sources) <= self.max_companies:
+            return
+        # Evict in batches so the rebuild runs once per tenth of the cap, not per write
+        keep = max(1, self.max_companies * 9 // 10)
+        while len(self.sources) > keep:
+            self.sources.popitem(last=False)
+            self.evicted += 1
+        self._rebuild()
+
+    def _rebuild(self):
+        t = time.perf_counter()
+        self._reset()
+        for company_name, (kind, payload) in self.sources.items():
+            if kind == "run":
+                self._write_entities(*payload)
+            else:
+                self._write_saved_result(company_name, payload)
+        logger.info(
+            f"Graph store rebuilt for {len(self.sources)} companies in "
+            f"{(time.perf_counter() - t) * 1000:.0f}ms ({self.evicted} evicted so far)"
+        )
+
+    def _write_entities(self, core: CoreEntities, market: MarketEntities, signals: SignalEntities):
+        company = self.node("Company", core.company.name)
+        market_id = self.node("Market", market.market.name) if market.market.name else None
+        if market_id is not None:
+            self.link(company, "OPERATES_IN", market_id)
+
+        for f in core.founders:
+            person = self.node("Person", f.name)
+            self.link(person, "FOUNDED", company)
+            for prior in f.prior_companies:
+                if prior:
+                    self.link(person, "PREVIOUSLY_AT", self.node("Company", prior))
+        for i in core.investors:
+            self.link(self.node("Investor", i.name), "INVESTED_IN", company)
+        for c in core.competitors:
+            self.link(company, "COMPETES_WITH", self.node("Company", c.name))
+        for cd in market.competitor_details:
+            competitor = self.node("Company", cd.name)
+            for inv_name in cd.key_investors:
+                if inv_name:
+                    self.link(self.node("Investor", inv_name), "INVESTED_IN", competitor)
+        for a in market.acquisitions:
+            if a.target and a.acquirer:
+                self._add_acquisition(a.acquirer, a.target, market_id)
+        for p in signals.partnerships:
+            if p.partner:
+                self.link(company, "PARTNERS_WITH", self.node("Company", p.partner))
+
+    def _add_acquisition(self, acquirer: str, target: str, market_id: int | None):
+        target_id = self.node("Company", target)
+        self.link(self.node("Company", acquirer), "ACQUIRED", target_id)
+        if market_id is not None:
+            self.link(target_id, "OPERATES_IN", market_id)
+
+    def _write_saved_result(self, company_name: str, result: dict):
+        company = self.node("Company", company_name)
+        market_name = (result.get("market_info") or {}).get("name") or ""
+        market_id = self.node("Market", market_name) if market_name else None
+        if market_id is not None:
+            self.link(company, "OPERATES_IN", market_id)
+        for comp in result.get("comps_table") or []:
+            if comp.get("target") and comp.get("acquirer"):
+                self._add_acquisition(comp["acquirer"], comp["target"], market_id)
+        for overlap in result.get("investor_overlaps") or []:
+            if not overlap.get("investor"):
+                continue
+            investor = self.node("Investor", overlap["investor"])
+            self.link(investor, "INVESTED_IN", company)
+            for name in overlap.get("also_backs") or []:
+                competitor = self.node("Company", name)
+                self.link(company, "COMPETES_WITH", competitor)
+                self.link(investor, "INVESTED_IN", competitor)
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+
+    def analyze(self, company_name: str) -> GraphInsights:
+        """The four outputs of GraphAgent.run_analysis_queries, from adjacency sets."""
+        if company_name in self.sources:
+            self.sources.move_to_end(company_name)
+        insights = GraphInsights(engine="memory")
+        insights.graph_stats = {
+            label: self.label_counts[label] for label in LABELS if self.label_counts[label]
+        }
+        target = self.find("Company", company_name)
+        if target is None:
+            insights.competitive_density = {"competitor_count": 0}
+            return insights
+
+        # Competitors, either direction
+        competitors = self.outgoing(target, "COMPETES_WITH") | self.incoming(target, "COMPETES_WITH")
+        insights.competitive_density = {"competitor_count": len(competitors)}
+
+        # 1. Investors in the target who also back one of its competitors
+        for investor in sorted(self.incoming(target, "INVESTED_IN"), key=self.names.__getitem__):
+            if self.labels[investor] != "Investor":
+                continue
+            also_backs = self.outgoing(investor, "INVESTED_IN") & competitors
+            if also_backs:
+                insights.investor_overlaps.append({
+                    "investor": self.names[investor],
+                    "also_backs": sorted(self.names[c] for c in also_backs),
+                })
+
+        # 2. Top acquirers of other companies in the target's markets
+        acquired: Dict[int, Set[int]] = defaultdict(set)
+        for market_id in self.outgoing(target, "OPERATES_IN"):
+            for company in self.incoming(market_id, "OPERATES_IN"):
+                if company == target:
+                    continue
+                for acquirer in self.incoming(company, "ACQUIRED"):
+                    acquired[acquirer].add(company)
+        ranked = sorted(acquired.items(), key=lambda kv: (-len(kv[1]), self.names[kv[0]]))[:5]
+        insights.top_acquirers = [
+            {
+                "acquirer": self.names[acquirer],
+                "deal_count": len(targets),
+                "targets_acquired": sorted(self.names[t] for t in targets),
+            }
+            for acquirer, targets in ranked
+        ]
+        return insights
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self.names),
+            "edges": sum(len(s) for adjacency in self.out.values() for s in adjacency),
+            "labels": dict(self.label_counts),
+            "companies": len(self.sources),
+            "max_companies": self.max_companies,
+            "evicted": self.evicted,
+        }
+
+
+store = GraphStore()
+
+
+async def seed_from_history():
+    """Load entities from saved analyses so insights span past companies too."""
+    import database
+    t = time.perf_counter()
+    rows = await database.get_graph_seed(GRAPH_SEED_LIMIT)
+    for row in rows:
+        store.add_saved_result(row["company_name"], row["result"])
+    logger.info(
+        f"Graph store seeded from {len(rows)} saved analyses in "
+        f"{(time.perf_counter() - t) * 1000:.0f}ms — {store.stats()}"
+    )
+
+
+# ── Neo4j write-behind mirror ─────────────────────────────────────────────────
+# With the memory engine primary, Neo4j (when configured) is written in the
+# background after the pipeline has its insights; nothing waits on it.
+
+_mirror_tasks: Set[asyncio.Task] = set()
+
+
+def mirror_to_neo4j(core: CoreEntities, market: MarketEntities, signals: SignalEntities):
+    from agents.graph import GraphAgent
+
+    async def write():
+        agent = GraphAgent()
+        try:
+            await agent.build_graph(core, market, signals)
+        except Exception as e:
+            logger.warning(f"Neo4j mirror write failed for '{core.company.name}': {e}")
+        finally:
+            await agent.close()
+
+    task = asyncio.create_task(write(), name=f"neo4j-mirror:{core.company.name}")
+    _mirror_tasks.add(task)
+    task.add_done_callback(_mirror_tasks.discard)
+
+
+async def flush_mirror():
+    """Wait for pending mirror writes — called before the Neo4j driver closes."""
+    if _mirror_tasks:
+        await asyncio.gather(*_mirror_tasks, return_exceptions=True)
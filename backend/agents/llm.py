@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+import httpx
+import openai
+from openai import AsyncOpenAI
+import http_client
+import jsoncodec
+from cache import llm_cache
+from metrics import OPENAI_SECONDS, OPENAI_TOKENS, timed
+from ratelimit import openai_limiter, retry_after_seconds
+from agents.runstats import TOKEN_FIELDS, cached_ratio, current_run
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE,
+    OPENAI_MAX_RETRIES,
+    LLM_CACHE_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+# Single AsyncOpenAI client for the whole process, riding on the pooled
+# keep-alive httpx client from http_client (closed in the app lifespan).
+_client: AsyncOpenAI | None = None
+_http: httpx.AsyncClient | None = None
+
+
+def get_client() -> AsyncOpenAI:
+    global _client, _http
+    # Rebuilt whenever the shared httpx client is closed or swapped out in
+    # http_client.clients, so the SDK never holds a dead transport
+    if _client is None or _http is None or _http.is_closed or http_client.clients.get("openai") is not _http:
+        _http = http_client.get_client(
+            "openai",
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive=OPENAI_MAX_KEEPALIVE,
+            timeout=600.0,
+        )
+        # SDK retries are off — _admitted() retries through the shared limiter
+        # so 429s shrink the process-wide concurrency window.
+        _client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0, http_client=_http)
+    return _client
+
+
+def _retry_delay(error: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying `error`, or None if it isn't retryable."""
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return None
+        delay = retry_after_seconds(error.response.headers, default=2.0 ** attempt)
+        openai_limiter.on_throttle(delay)
+        return 0.0          # the limiter's pause does the waiting
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return min(2.0 ** attempt, 30.0)
+    return None
+
+
+def _usage_of(obj: Any) -> Dict[str, int] | None:
+    """
+    Token counts from a Responses object, a Chat completion, the Responses
+    stream's response.completed event, or a Chat stream's final chunk.
+    """
+    if getattr(obj, "type", None) == "response.completed":
+        obj = obj.response
+    usage = getattr(obj, "usage", None)
+    if usage is None:
+        return None
+    if hasattr(usage, "input_tokens"):      # Responses API
+        details = getattr(usage, "input_tokens_details", None)
+        return {
+            "input_tokens": usage.input_tokens or 0,
+            "output_tokens": usage.output_tokens or 0,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        }
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens or 0,
+        "output_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def _record_usage(schema: str, api: str, seconds: float, usage: Dict[str, int] | None):
+    if usage is None:
+        return
+    logger.info(
+        f"OpenAI {schema} ({api}): {usage['input_tokens']} in / {usage['output_tokens']} out, "
+        f"{usage['cached_tokens']} cached ({cached_ratio(usage):.0%}) in {seconds:.2f}s"
+    )
+    current_run().record(schema, api=api, seconds=round(seconds, 3), **usage)
+    for field in TOKEN_FIELDS:
+        OPENAI_TOKENS.labels(schema=schema, kind=field.removesuffix("_tokens")).inc(usage[field])
+
+
+async def _admitted(make_call: Callable[[], Awaitable[Any]], schema: str, api: str) -> Any:
+    """Run one OpenAI request through the shared limiter, re-queuing it on
+    429s and transient failures instead of surfacing them."""
+    with timed(OPENAI_SECONDS, schema=schema, api=api):
+        result, seconds = await _admitted_call(make_call)
+    _record_usage(schema, api, seconds, _usage_of(result))
+    return result
+
+
+async def _admitted_call(make_call: Callable[[], Awaitable[Any]]) -> tuple[Any, float]:
+    """The response and the upstream time of the attempt that produced it."""
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            async with openai_limiter.slot():
+                start = time.perf_counter()
+                result = await make_call()
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == OPENAI_MAX_RETRIES:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        openai_limiter.on_success()
+        return result, time.perf_counter() - start
+
+
+async def _admitted_stream(make_call: Callable[[], Awaitable[Any]], schema: str, api: str) -> AsyncIterator[Any]:
+    """Streaming counterpart of _admitted — the slot is held until the stream ends."""
+    usage = None
+    start = time.perf_counter()
+    with timed(OPENAI_SECONDS, schema=schema, api=api):
+        async for event in _admitted_stream_call(make_call):
+            usage = _usage_of(event) or usage
+            yield event
+    _record_usage(schema, api, time.perf_counter() - start, usage)
+
+
+async def _admitted_stream_call(make_call: Callable[[], Awaitable[Any]]) -> AsyncIterator[Any]:
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        await openai_limiter.acquire()
+        try:
+            try:
+                stream = await make_call()
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == OPENAI_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            async for event in stream:
+                yield event
+            openai_limiter.on_success()
+            return
+        finally:
+            await openai_limiter.release()
+
+
+def _safe_input(content: str) -> str:
+    # Responses API rejects empty input — substitute a placeholder so extraction
+    # returns an empty-but-valid structure rather than raising an error.
+    safe_content = content.strip() if content else ""
+    return safe_content or "No research data was available for this query."
+
+
+async def call_structured(instructions: str, content: str, schema: dict, schema_name: str) -> dict:
+    """
+    Call OpenAI and return parsed JSON, served from the LLM cache when the
+    same (model, instructions, schema, input) was answered before.
+    Tries the Responses API first; falls back to Chat Completions.
+    """
+    run = current_run()
+    safe_content = _safe_input(content)
+
+    key = llm_cache.key_for(OPENAI_MODEL, instructions, schema, safe_content)
+    if LLM_CACHE_ENABLED and not run.bypass_cache:
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            run.record(schema_name, cache="hit")
+            return cached
+
+    data = await _call_structured_api(instructions, safe_content, schema, schema_name)
+    run.record(schema_name, cache="bypass" if run.bypass_cache else "miss")
+    if LLM_CACHE_ENABLED:
+        await llm_cache.set(key, schema_name, data)
+    return data
+
+
+async def _call_structured_api(instructions: str, safe_content: str, schema: dict, schema_name: str) -> dict:
+    client = get_client()
+    try:
+        response = await _admitted(lambda: client.responses.create(
+            model=OPENAI_MODEL,
+            instructions=instructions,
+            input=safe_content,
+            text={
+                "format": {
+                    "type": "json_schema",
+                    "name": schema_name,
+                    "schema": schema,
+                    "strict": True,
+                }
+            },
+        ), schema=schema_name, api="responses")
+        return jsoncodec.loads(response.output_text)
+    except Exception as e:
+        logger.warning(f"Responses API failed ({e}), falling back to Chat Completions")
+
+    # Fallback: Chat Completions with JSON schema response format
+    response = await _admitted(lambda: client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": safe_content},
+        ],
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": schema_name,
+                "schema": schema,
+                "strict": True,
+            },
+        },
+    ), schema=schema_name, api="chat")
+    return jsoncodec.loads(response.choices[0].message.content)
+
+
+async def call_freeform(instructions: str, content: str) -> str:
+    """
+    Call OpenAI for free-form text output (investment memo).
+    Tries Responses API first, then falls back to Chat Completions.
+    """
+    client = get_client()
+    safe_content = _safe_input(content)
+
+    try:
+        response = await _admitted(lambda: client.responses.create(
+            model=OPENAI_MODEL,
+            instructions=instructions,
+            input=safe_content,
+        ), schema="memo", api="responses")
+        return response.output_text
+    except Exception as e:
+        logger.warning(f"Responses API (freeform) failed ({e}), falling back to Chat Completions")
+
+    response = await _admitted(lambda: client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": safe_content},
+        ],
+    ), schema="memo", api="chat")
+    return response.choices[0].message.content
+
+
+async def stream_freeform(instructions: str, content: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of call_freeform — yields text deltas as the model
+    produces them. Falls back to streamed Chat Completions only if the
+    Responses stream fails before emitting anything, so text is never duplicated.
+    """
+    client = get_client()
+    safe_content = _safe_input(content)
+
+    emitted = False
+    try:
+        stream = _admitted_stream(lambda: client.responses.create(
+            model=OPENAI_MODEL,
+            instructions=instructions,
+            input=safe_content,
+            stream=True,
+        ), schema="memo", api="responses_stream")
+        async for event in stream:
+            if event.type == "response.output_text.delta" and event.delta:
+                emitted = True
+                yield event.delta
+        return
+    except Exception as e:
+        if emitted:
+            raise
+        logger.warning(f"Responses API (stream) failed ({e}), falling back to Chat Completions")
+
+    stream = _admitted_stream(lambda: client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": safe_content},
+        ],
+        stream=True,
+        stream_options={"include_usage": True},
+    ), schema="memo", api="chat_stream")
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
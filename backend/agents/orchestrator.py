@@ -1,15 +1,17 @@
-import asyncio
-import json
 import logging
 import time
 from typing import AsyncGenerator
 
+from config import MEMO_STREAMING, GRAPH_ENGINE, NEO4J_ENABLED
+from agents import graph_memory, runstats
 from agents.research import ResearchAgent
 from agents.extraction import ExtractionAgent
 from agents.graph import GraphAgent
 from agents.analysis import AnalysisAgent, MemoAgent
+from agents.scheduler import Task, TaskGraph
+from metrics import PHASE_SECONDS, PIPELINE_SECONDS, PIPELINES_IN_FLIGHT, timed
 from schemas.core import CoreEntities, MarketEntities, SignalEntities
-from schemas.outputs import GraphInsights
+from schemas.outputs import AnalysisOutput, GraphInsights
 
 logger = logging.getLogger(__name__)
 
@@ -28,18 +30,134 @@ class OrchestratorAgent:
     def __init__(self):
         self.research = ResearchAgent()
         self.extraction = ExtractionAgent()
-        self.graph = GraphAgent()
+        # The memory engine never touches Neo4j on the request path (the
+        # write-behind mirror opens its own GraphAgent)
+        self.graph = GraphAgent() if GRAPH_ENGINE != "memory" else None
         self.analysis_agent = AnalysisAgent()
         self.memo_agent = MemoAgent()
+        self.graph_timings = {}
+
+    def _build_pipeline(self, company: str) -> TaskGraph:
+        """
+        The pipeline as a DAG. Each task names the upstream results it needs;
+        everything else is free to overlap. Company-only wave 3 searches and
+        the preferences lookup start immediately, sector-level queries start
+        as soon as core extraction lands, and only the acquirer queries wait
+        for market extraction.
+        """
+        research = self.research
+        fmt = research.format_for_extraction
+
+        async def extract_core(wave1):
+            return await self.extraction.extract_core(fmt(wave1, "core", [company]))
+
+        async def wave2_sector(core: CoreEntities):
+            return await research.wave_2_sector(core.company.sector)
+
+        async def wave2_competitors(core: CoreEntities):
+            return await research.wave_2_competitors([c.name for c in core.competitors[:3]])
+
+        async def extract_market(core: CoreEntities, sector_results, competitor_results):
+            focus = [company, core.company.sector] + [c.name for c in core.competitors[:3]]
+            return await self.extraction.extract_market(
+                fmt(sector_results + competitor_results, "market", focus)
+            )
+
+        async def wave3_sector(core: CoreEntities):
+            return await research.wave_3_sector(core.company.sector)
+
+        async def wave3_acquirers(market: MarketEntities):
+            return await research.wave_3_acquirers([a.acquirer for a in market.acquisitions[:2]])
+
+        async def extract_signals(core: CoreEntities, market: MarketEntities,
+                                  company_results, sector_results, acquirer_results):
+            focus = [company, core.company.sector] + [a.acquirer for a in market.acquisitions[:2]]
+            return await self.extraction.extract_signals(
+                fmt(company_results + sector_results + acquirer_results, "signals", focus)
+            )
+
+        async def build_graph(core, market, signals) -> GraphInsights:
+            if self.graph is None:
+                try:
+                    t = time.perf_counter()
+                    graph_memory.store.add_entities(core, market, signals)
+                    insights = graph_memory.store.analyze(company)
+                    self.graph_timings = {"memory": round((time.perf_counter() - t) * 1000, 3)}
+                except Exception as e:
+                    logger.warning(f"In-memory graph phase failed ({e}) — continuing without graph insights")
+                    return GraphInsights(neo4j_available=False)
+                if NEO4J_ENABLED:
+                    graph_memory.mirror_to_neo4j(core, market, signals)
+                return insights
+            try:
+                await self.graph.build_graph(core, market, signals)
+                self.graph_timings = self.graph.write_timings
+                return await self.graph.run_analysis_queries(company)
+            except Exception as e:
+                logger.warning(f"Graph phase failed ({e}) — continuing without Neo4j")
+                return GraphInsights(neo4j_available=False)
+
+        async def load_preferences():
+            # Load any saved analyst preferences to personalise the memo
+            try:
+                import database
+                return await database.get_preferences()
+            except Exception:
+                return ""
+
+        return TaskGraph([
+            Task("wave1", lambda: research.wave_1(company)),
+            Task("wave3_company", lambda: research.wave_3_company(company)),
+            Task("preferences", load_preferences),
+            Task("core", extract_core, ["wave1"]),
+            Task("wave2_sector", wave2_sector, ["core"]),
+            Task("wave2_competitors", wave2_competitors, ["core"]),
+            Task("market", extract_market, ["core", "wave2_sector", "wave2_competitors"]),
+            Task("wave3_sector", wave3_sector, ["core"]),
+            Task("wave3_acquirers", wave3_acquirers, ["market"]),
+            Task("signals", extract_signals, ["core", "market", "wave3_company", "wave3_sector", "wave3_acquirers"]),
+            Task("graph", build_graph, ["core", "market", "signals"]),
+            Task("analysis", self.analysis_agent.analyze, ["core", "market", "signals", "graph"]),
+        ])
 
     async def run(
         self,
         company: str,
         stage: str,
         exit_type: str = "",
+        bypass_llm_cache: bool = False,
     ) -> AsyncGenerator[dict, None]:
 
         total_start = time.time()
+        # Bound before the DAG starts so every task reports into this run's stats
+        self.run_stats = runstats.start_run(bypass_cache=bypass_llm_cache)
+        pipeline = self._build_pipeline(company).start()
+        try:
+            with PIPELINES_IN_FLIGHT.track_inprogress(), timed(PIPELINE_SECONDS):
+                async for event in self._report(pipeline, company, stage, exit_type, total_start):
+                    yield event
+        finally:
+            await pipeline.cancel()
+            if self.graph is not None:
+                await self.graph.close()
+            for name, seconds in pipeline.timings.items():
+                PHASE_SECONDS.labels(name).observe(seconds)
+        logger.info(f"Pipeline task timings for '{company}': {pipeline.timings}")
+        logger.info(f"LLM usage for '{company}': {self.run_stats.usage()['total']}")
+
+    async def _report(
+        self,
+        pipeline: TaskGraph,
+        company: str,
+        stage: str,
+        exit_type: str,
+        total_start: float,
+    ) -> AsyncGenerator[dict, None]:
+        """
+        Walks the DAG results in phase order so SSE status events keep their
+        step-by-step semantics; `elapsed` is the time spent waiting on each
+        phase, which shrinks when its work already overlapped an earlier one.
+        """
 
         # ── Phase 1: Research ─────────────────────────────────────────────────
         yield _event("status", {
@@ -48,7 +166,8 @@ class OrchestratorAgent:
             "icon": "search",
         })
         t = time.time()
-        wave1_results = await self.research.wave_1(company)
+        wave1_results = await pipeline.result("wave1")
+        degraded = self.run_stats.degraded_searches("1")
         if not wave1_results:
             logger.warning("Wave 1 returned 0 results — Tavily may be rate-limited or out of credits (HTTP 432)")
         yield _event("status", {
@@ -56,7 +175,8 @@ class OrchestratorAgent:
             "message": f"Wave 1 complete — {len(wave1_results)} sources found" if wave1_results
                        else "Wave 1 returned no results — Tavily search unavailable (check API credits)",
             "elapsed": round(time.time() - t, 1),
-            "icon": "check" if wave1_results else "warning",
+            "degraded_searches": degraded,
+            "icon": "check" if wave1_results and not degraded else "warning",
         })
 
         # ── Phase 2: Core extraction ──────────────────────────────────────────
@@ -66,16 +186,15 @@ class OrchestratorAgent:
             "icon": "brain",
         })
         t = time.time()
-        wave1_text = self.research.format_for_extraction(wave1_results)
-        core: CoreEntities = await asyncio.get_event_loop().run_in_executor(
-            None, self.extraction.extract_core, wave1_text
-        )
+        core: CoreEntities = await pipeline.result("core")
         yield _event("status", {
             "step": 2, "total": 6,
             "message": f"Extracted: {len(core.competitors)} competitors, {len(core.investors)} investors",
             "elapsed": round(time.time() - t, 1),
+            "llm_cache": self.run_stats.cache_status("core_extraction"),
             "icon": "check",
         })
+        yield _event("entities_ready", {"company_info": core.company.model_dump()})
 
         # ── Phase 3: Market + competitor deep-dive ────────────────────────────
         yield _event("status", {
@@ -84,18 +203,17 @@ class OrchestratorAgent:
             "icon": "search",
         })
         t = time.time()
-        competitor_names = [c.name for c in core.competitors[:3]]
-        wave2_results = await self.research.wave_2(company, core.company.sector, competitor_names)
-        wave2_text = self.research.format_for_extraction(wave2_results)
-        market: MarketEntities = await asyncio.get_event_loop().run_in_executor(
-            None, self.extraction.extract_market, wave2_text
-        )
+        market: MarketEntities = await pipeline.result("market")
+        degraded = self.run_stats.degraded_searches("2_sector", "2_competitors")
         yield _event("status", {
             "step": 3, "total": 6,
             "message": f"Found {len(market.acquisitions)} M&A comps, market: {market.market.name or 'TBD'}",
             "elapsed": round(time.time() - t, 1),
-            "icon": "check",
+            "llm_cache": self.run_stats.cache_status("market_extraction"),
+            "degraded_searches": degraded,
+            "icon": "warning" if degraded else "check",
         })
+        yield _event("market_ready", {"market_info": market.market.model_dump()})
 
         # ── Phase 3b: Risk signals + exit intelligence ────────────────────────
         yield _event("status", {
@@ -104,39 +222,43 @@ class OrchestratorAgent:
             "icon": "search",
         })
         t = time.time()
-        top_acquirer_names = [a.acquirer for a in market.acquisitions[:2]]
-        wave3_results = await self.research.wave_3(company, core.company.sector, top_acquirer_names)
-        wave3_text = self.research.format_for_extraction(wave3_results)
-        signals: SignalEntities = await asyncio.get_event_loop().run_in_executor(
-            None, self.extraction.extract_signals, wave3_text
-        )
+        signals: SignalEntities = await pipeline.result("signals")
+        degraded = self.run_stats.degraded_searches("3_company", "3_sector", "3_acquirers")
         yield _event("status", {
             "step": 3, "total": 6,
             "message": f"Detected {len(signals.risk_signals)} risk signals",
             "elapsed": round(time.time() - t, 1),
-            "icon": "check",
+            "llm_cache": self.run_stats.cache_status("signal_extraction"),
+            "degraded_searches": degraded,
+            "icon": "warning" if degraded else "check",
         })
 
         # ── Phase 4: Graph construction ───────────────────────────────────────
         yield _event("status", {
             "step": 4, "total": 6,
-            "message": "Building relationship graph in Neo4j...",
+            "message": "Building relationship graph in memory..." if GRAPH_ENGINE == "memory"
+                       else "Building relationship graph in Neo4j...",
             "icon": "graph",
         })
         t = time.time()
-        try:
-            await self.graph.build_graph(core, market, signals)
-            graph_insights: GraphInsights = await self.graph.run_analysis_queries(company)
-        except Exception as e:
-            logger.warning(f"Graph phase failed ({e}) — continuing without Neo4j")
-            graph_insights = GraphInsights(neo4j_available=False)
+        graph_insights: GraphInsights = await pipeline.result("graph")
+        if graph_insights.engine == "memory":
+            graph_message = f"Graph ready — in-memory engine ({graph_insights.graph_stats.get('Company', 0)} companies)"
+        else:
+            graph_message = f"Graph ready — Neo4j {'connected' if graph_insights.neo4j_available else 'unavailable (local mode)'}"
         yield _event("status", {
             "step": 4, "total": 6,
-            "message": f"Graph ready — Neo4j {'connected' if graph_insights.neo4j_available else 'unavailable (local mode)'}",
+            "message": graph_message,
             "elapsed": round(time.time() - t, 1),
+            "write_latency_ms": self.graph_timings,
             "icon": "check",
         })
-        yield _event("graph_ready", {"neo4j_available": graph_insights.neo4j_available})
+        yield _event("graph_ready", {
+            "neo4j_available": graph_insights.neo4j_available,
+            "engine": graph_insights.engine,
+            "graph_stats": graph_insights.graph_stats,
+            "investor_overlaps": graph_insights.investor_overlaps,
+        })
 
         # ── Phase 5: Analysis ─────────────────────────────────────────────────
         yield _event("status", {
@@ -145,24 +267,25 @@ class OrchestratorAgent:
             "icon": "chart",
         })
         t = time.time()
-        from schemas.outputs import AnalysisOutput
-        analysis: AnalysisOutput = await asyncio.get_event_loop().run_in_executor(
-            None, self.analysis_agent.analyze, core, market, signals, graph_insights
-        )
+        analysis: AnalysisOutput = await pipeline.result("analysis")
         yield _event("status", {
             "step": 5, "total": 6,
             "message": f"Analysis complete — {len(analysis.red_flags)} red flags, exit scores generated",
             "elapsed": round(time.time() - t, 1),
+            "llm_cache": self.run_stats.cache_status(*self.analysis_agent.call_names),
             "icon": "check",
         })
+        # The Comps / Risks / Acquirers tabs only need this — send it before the memo
+        yield _event("analysis_ready", {
+            "comps_table": [c.model_dump() for c in analysis.comps],
+            "red_flags": [r.model_dump() for r in analysis.red_flags],
+            "exit_scores": analysis.exit_probability.model_dump(),
+            "likely_acquirers": [a.model_dump() for a in analysis.ranked_acquirers],
+            "competitive_position": analysis.competitive_position,
+        })
 
         # ── Phase 6: Investment memo ───────────────────────────────────────────
-        # Load any saved analyst preferences to personalise the memo
-        try:
-            import database
-            preferences = await database.get_preferences()
-        except Exception:
-            preferences = ""
+        preferences: str = await pipeline.result("preferences")
 
         yield _event("status", {
             "step": 6, "total": 6,
@@ -171,13 +294,23 @@ class OrchestratorAgent:
             "icon": "document",
         })
         t = time.time()
-        memo: str = await asyncio.get_event_loop().run_in_executor(
-            None,
-            self.memo_agent.generate,
-            company, stage, exit_type,
-            core, market, signals, analysis, graph_insights,
-            preferences,
-        )
+        if MEMO_STREAMING:
+            memo_parts = []
+            async for delta in self.memo_agent.generate_stream(
+                company, stage, exit_type,
+                core, market, signals, analysis, graph_insights,
+                preferences,
+            ):
+                memo_parts.append(delta)
+                yield _event("memo_delta", {"delta": delta})
+            memo = "".join(memo_parts)
+        else:
+            memo = await self.memo_agent.generate(
+                company, stage, exit_type,
+                core, market, signals, analysis, graph_insights,
+                preferences,
+            )
+        PHASE_SECONDS.labels("memo").observe(time.time() - t)
         yield _event("status", {
             "step": 6, "total": 6,
             "message": "Investment memo complete",
@@ -187,18 +320,13 @@ class OrchestratorAgent:
 
         # ── Done ──────────────────────────────────────────────────────────────
         total_elapsed = round(time.time() - total_start, 1)
+        # Structured results already went out in the *_ready events; clients
+        # merge those with this to get the full result
         yield _event("complete", {
             "total_elapsed": total_elapsed,
             "memo": memo,
-            "comps_table": [c.model_dump() for c in analysis.comps],
-            "red_flags": [r.model_dump() for r in analysis.red_flags],
-            "exit_scores": analysis.exit_probability.model_dump(),
-            "likely_acquirers": [a.model_dump() for a in analysis.ranked_acquirers],
-            "competitive_position": analysis.competitive_position,
-            "company_info": core.company.model_dump(),
-            "market_info": market.market.model_dump(),
-            "graph_stats": graph_insights.graph_stats,
-            "investor_overlaps": graph_insights.investor_overlaps,
+            "usage": self.run_stats.usage(),
+            # Searches that failed (e.g. still throttled after every retry) —
+            # a non-empty list means the memo was built on partial research
+            "failed_searches": self.run_stats.failed_searches,
         })
-
-        await self.graph.close()
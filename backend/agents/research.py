@@ -1,11 +1,31 @@
 import asyncio
 import logging
-from typing import List, Dict, Any
-from tavily import TavilyClient
-from config import TAVILY_API_KEY
+from typing import Iterable, List, Dict, Any
+import http_client
+from config import (
+    TAVILY_API_KEY,
+    TAVILY_BASE_URL,
+    TAVILY_MAX_CONNECTIONS,
+    TAVILY_MAX_KEEPALIVE,
+    TAVILY_TIMEOUT,
+    TAVILY_MAX_RETRIES,
+)
+from cache import search_cache
+from metrics import TAVILY_SECONDS, timed
+from agents.corpus import build_corpus
+from ratelimit import tavily_limiter, retry_after_seconds
+from agents.runstats import record_failed_search
 
 logger = logging.getLogger(__name__)
 
+# Every Tavily call uses the same parameters — they are part of the cache key
+SEARCH_PARAMS = {
+    "search_depth": "basic",
+    "include_answer": True,
+    "include_raw_content": False,
+    "max_results": 5,
+}
+
 
 class ResearchAgent:
     """
@@ -14,50 +34,80 @@ class ResearchAgent:
     """
 
     def __init__(self):
-        self.client = TavilyClient(api_key=TAVILY_API_KEY)
-        self.seen_urls: set = set()
+        self.client = http_client.get_client(
+            "tavily",
+            base_url=TAVILY_BASE_URL,
+            max_connections=TAVILY_MAX_CONNECTIONS,
+            max_keepalive=TAVILY_MAX_KEEPALIVE,
+            timeout=TAVILY_TIMEOUT,
+        )
+
+    async def _fetch(self, query: str, topic: str) -> Dict[str, Any]:
+        """Raw Tavily call over the shared keep-alive client — only the fields
+        the pipeline reads are kept (and cached). Admission goes through the
+        shared Tavily limiter; throttled calls (429/432) are re-queued behind
+        the server's Retry-After rather than returned empty."""
+        for attempt in range(TAVILY_MAX_RETRIES + 1):
+            async with tavily_limiter.slot():
+                response = await self.client.post(
+                    "/search",
+                    json={"api_key": TAVILY_API_KEY, "query": query, "topic": topic, **SEARCH_PARAMS},
+                )
+            if response.status_code not in (429, 432):
+                break
+            tavily_limiter.on_throttle(retry_after_seconds(response.headers, default=2.0 ** attempt))
+        if response.status_code == 200:
+            tavily_limiter.on_success()
+        else:
+            try:
+                detail = response.json()["detail"]["error"]
+            except Exception:
+                detail = response.text[:200]
+            if response.status_code in (429, 432):
+                detail = f"still throttled after {TAVILY_MAX_RETRIES} retries — {detail}"
+            raise RuntimeError(f"HTTP {response.status_code}: {detail}")
+        data = response.json()
+        return {
+            "answer": data.get("answer") or "",
+            "results": data.get("results", []),
+        }
 
-    def _search(self, query: str, topic: str = "general") -> List[Dict[str, Any]]:
-        """Run a single Tavily search and return deduplicated results."""
+    async def _search(self, query: str, topic: str = "general", wave: str = "adhoc") -> List[Dict[str, Any]]:
+        """Run a single Tavily search (served from the search cache when warm).
+        A failed search contributes no results and is recorded against the run
+        so the pipeline can report it as degraded."""
         try:
-            response = self.client.search(
-                query=query,
-                search_depth="basic",
-                include_answer=True,
-                include_raw_content=False,
-                max_results=5,
-                topic=topic,
-            )
-            results = []
-            for r in response.get("results", []):
-                url = r.get("url", "")
-                if url not in self.seen_urls:
-                    self.seen_urls.add(url)
-                    results.append(r)
-            # Include the synthesized answer too
-            answer = response.get("answer", "")
-            if answer:
-                results.insert(0, {"url": f"tavily_answer_{query[:30]}", "content": answer, "title": "Tavily Answer"})
-            return results
+            with timed(TAVILY_SECONDS, wave=wave, source="cache") as labels:
+                response = await search_cache.get(query, topic, SEARCH_PARAMS)
+                if response is None:
+                    labels["source"] = "api"
+                    response = await self._fetch(query, topic)
+                    await search_cache.set(query, topic, SEARCH_PARAMS, response)
         except Exception as e:
             logger.warning(f"Tavily search failed for '{query}': {e}")
+            record_failed_search(wave, query, str(e))
             return []
 
-    async def _parallel_search(self, queries: List[tuple]) -> List[Dict[str, Any]]:
+        results = list(response.get("results", []))
+        # Include the synthesized answer too
+        answer = response.get("answer", "")
+        if answer:
+            results.insert(0, {"url": f"tavily_answer_{query[:30]}", "content": answer, "title": "Tavily Answer"})
+        return results
+
+    async def _parallel_search(self, queries: List[tuple], wave: str = "adhoc") -> List[Dict[str, Any]]:
         """
-        Run multiple searches in parallel using a thread pool.
-        queries: list of (query_string, topic) tuples
+        Run multiple searches concurrently and combine their results in query
+        order, so the same searches always produce the same corpus (and hit the
+        LLM response cache). Results are deliberately not consumed in
+        completion order: every consumer needs the whole wave before it can
+        build its corpus, so arrival order would only make corpora vary from
+        run to run. Overlap comes from the DAG scheduling waves concurrently.
         """
-        loop = asyncio.get_event_loop()
-        tasks = [
-            loop.run_in_executor(None, self._search, q, topic)
-            for q, topic in queries
-        ]
-        results_list = await asyncio.gather(*tasks, return_exceptions=True)
+        results_list = await asyncio.gather(*(self._search(q, topic, wave) for q, topic in queries))
         combined = []
         for results in results_list:
-            if isinstance(results, list):
-                combined.extend(results)
+            combined.extend(results)
         return combined
 
     async def wave_1(self, company: str) -> List[Dict[str, Any]]:
@@ -69,55 +119,56 @@ class ResearchAgent:
             (f"{company} revenue traction customers growth", "general"),
         ]
         logger.info(f"Wave 1: {len(queries)} searches for '{company}'")
-        return await self._parallel_search(queries)
+        return await self._parallel_search(queries, wave="1")
 
-    async def wave_2(
-        self,
-        company: str,
-        sector: str,
-        competitors: List[str],
-    ) -> List[Dict[str, Any]]:
-        """Sector + M&A deep-dive using extracted entities from wave 1."""
+    async def wave_2_sector(self, sector: str) -> List[Dict[str, Any]]:
+        """Sector + M&A deep-dive — needs only the sector from core extraction."""
         current_year = "2025"
         queries = [
             (f"M&A acquisitions {sector} {current_year}", "general"),
             (f"{sector} market size TAM growth rate", "general"),
             (f"companies acquired in {sector} deal size valuation", "general"),
         ]
-        # Add targeted competitor queries (up to 3)
-        for comp in competitors[:3]:
-            queries.append((f"{comp} funding investors valuation", "general"))
+        logger.info(f"Wave 2 (sector): {len(queries)} searches for sector '{sector}'")
+        return await self._parallel_search(queries, wave="2_sector")
 
-        logger.info(f"Wave 2: {len(queries)} searches for sector '{sector}'")
-        return await self._parallel_search(queries)
+    async def wave_2_competitors(self, competitors: List[str]) -> List[Dict[str, Any]]:
+        """Targeted competitor funding queries (up to 3)."""
+        queries = [(f"{comp} funding investors valuation", "general") for comp in competitors[:3]]
+        logger.info(f"Wave 2 (competitors): {len(queries)} searches")
+        return await self._parallel_search(queries, wave="2_competitors")
 
-    async def wave_3(
-        self,
-        company: str,
-        sector: str,
-        top_acquirers: List[str],
-    ) -> List[Dict[str, Any]]:
-        """Risk signals + exit intelligence using extracted acquirer names."""
+    async def wave_3_company(self, company: str) -> List[Dict[str, Any]]:
+        """Risk signals that depend only on the company name — can run alongside wave 1."""
         queries = [
             (f"{company} layoffs controversy risks problems", "news"),
             (f"{company} partnerships strategic deals", "general"),
-            (f"{sector} IPO SPAC exit 2024 2025", "general"),
         ]
-        # Acquirer intelligence
-        for acquirer in top_acquirers[:2]:
-            queries.append((f"{acquirer} acquisition strategy M&A history", "general"))
-
-        logger.info(f"Wave 3: {len(queries)} searches for signals")
-        return await self._parallel_search(queries)
-
-    def format_for_extraction(self, results: List[Dict[str, Any]]) -> str:
-        """Convert raw Tavily results into a clean text blob for the LLM.
-        Capped at 40 sources to stay within model context limits."""
-        parts = []
-        for i, r in enumerate(results[:40], 1):  # Cap at 40 sources to stay within token limits
-            title = r.get("title", "")
-            url = r.get("url", "")
-            content = r.get("content", "")
-            if content:
-                parts.append(f"[Source {i}] {title}\n{url}\n{content}\n")
-        return "\n---\n".join(parts)
+        logger.info(f"Wave 3 (company): {len(queries)} searches for '{company}'")
+        return await self._parallel_search(queries, wave="3_company")
+
+    async def wave_3_sector(self, sector: str) -> List[Dict[str, Any]]:
+        """Sector exit activity."""
+        queries = [(f"{sector} IPO SPAC exit 2024 2025", "general")]
+        logger.info(f"Wave 3 (sector): {len(queries)} searches for sector '{sector}'")
+        return await self._parallel_search(queries, wave="3_sector")
+
+    async def wave_3_acquirers(self, top_acquirers: List[str]) -> List[Dict[str, Any]]:
+        """Acquirer intelligence using acquirer names extracted from wave 2."""
+        queries = [
+            (f"{acquirer} acquisition strategy M&A history", "general")
+            for acquirer in top_acquirers[:2]
+        ]
+        logger.info(f"Wave 3 (acquirers): {len(queries)} searches")
+        return await self._parallel_search(queries, wave="3_acquirers")
+
+    def format_for_extraction(
+        self,
+        results: List[Dict[str, Any]],
+        schema: str = "core",
+        focus: Iterable[str] = (),
+    ) -> str:
+        """Convert raw Tavily results into a clean text blob for the LLM —
+        deduplicated, ranked by relevance to `focus` and packed into the
+        token budget for `schema` (see agents/corpus.py)."""
+        return build_corpus(results, schema, focus)
@@ -0,0 +1,108 @@
+from contextvars import ContextVar
+from typing import Any, Dict, List
+from config import (
+    OPENAI_MODEL,
+    OPENAI_PRICE_INPUT,
+    OPENAI_PRICE_CACHED_INPUT,
+    OPENAI_PRICE_OUTPUT,
+)
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cached_tokens")
+
+
+class RunStats:
+    """
+    Per-pipeline record of LLM calls and of searches that failed outright.
+    start_run() binds one to the current context, so every call and search
+    made by tasks spawned afterwards reports into it.
+    """
+
+    def __init__(self, bypass_cache: bool = False):
+        self.bypass_cache = bypass_cache
+        self.calls: List[Dict] = []
+        self.failed_searches: List[Dict] = []
+
+    def record(self, name: str, **fields):
+        self.calls.append({"name": name, **fields})
+
+    def cache_status(self, *names: str) -> str:
+        """'hit' / 'miss' / 'bypass' for the named calls, or 'partial' if mixed."""
+        statuses = {c["cache"] for c in self.calls if c["name"] in names and "cache" in c}
+        if not statuses:
+            return "none"
+        return statuses.pop() if len(statuses) == 1 else "partial"
+
+    def degraded_searches(self, *waves: str) -> int:
+        """How many searches in the named waves failed and contributed nothing."""
+        return sum(1 for s in self.failed_searches if s["wave"] in waves)
+
+    def usage(self) -> Dict[str, Any]:
+        """
+        Token usage for the run — per call, per phase (the call's schema name)
+        and in total, with an estimated cost. Cache hits never reach OpenAI
+        and so add nothing.
+        """
+        calls = [c for c in self.calls if "input_tokens" in c]
+        phases: Dict[str, Dict[str, Any]] = {}
+        for c in calls:
+            _accumulate(phases.setdefault(c["name"], _empty_usage()), c)
+        total = _empty_usage()
+        for c in calls:
+            _accumulate(total, c)
+        for totals in (*phases.values(), total):
+            totals["seconds"] = round(totals["seconds"], 2)
+            totals["cached_ratio"] = cached_ratio(totals)
+            totals["cost_usd"] = _cost(totals)
+        return {
+            "model": OPENAI_MODEL,
+            "total": total,
+            "phases": phases,
+            "calls": [
+                {"name": c["name"], "api": c["api"], "seconds": c["seconds"], **{f: c[f] for f in TOKEN_FIELDS}}
+                for c in calls
+            ],
+        }
+
+
+def _empty_usage() -> Dict[str, Any]:
+    return {"calls": 0, "seconds": 0.0, **dict.fromkeys(TOKEN_FIELDS, 0)}
+
+
+def _accumulate(totals: Dict[str, Any], call: Dict[str, Any]):
+    totals["calls"] += 1
+    totals["seconds"] += call["seconds"]
+    for field in TOKEN_FIELDS:
+        totals[field] += call[field]
+
+
+def _cost(usage: Dict[str, Any]) -> float:
+    """Estimated USD cost from the configured per-million-token prices."""
+    uncached = usage["input_tokens"] - usage["cached_tokens"]
+    return round((
+        uncached * OPENAI_PRICE_INPUT
+        + usage["cached_tokens"] * OPENAI_PRICE_CACHED_INPUT
+        + usage["output_tokens"] * OPENAI_PRICE_OUTPUT
+    ) / 1_000_000, 6)
+
+
+def cached_ratio(usage: Dict[str, Any]) -> float:
+    return round(usage["cached_tokens"] / usage["input_tokens"], 3) if usage["input_tokens"] else 0.0
+
+
+_run_stats: ContextVar[RunStats | None] = ContextVar("run_stats", default=None)
+
+
+def start_run(bypass_cache: bool = False) -> RunStats:
+    stats = RunStats(bypass_cache=bypass_cache)
+    _run_stats.set(stats)
+    return stats
+
+
+def current_run() -> RunStats:
+    return _run_stats.get() or RunStats()
+
+
+def record_failed_search(wave: str, query: str, error: str):
+    """Note a search that returned nothing because it failed, so the run can
+    report itself as degraded instead of looking like an empty result."""
+    current_run().failed_searches.append({"wave": wave, "query": query, "error": error})
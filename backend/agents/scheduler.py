@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    """A pipeline step. `fn` is awaited with the results of `inputs`, in order."""
+
+    def __init__(self, name: str, fn: Callable[..., Awaitable[Any]], inputs: Iterable[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.inputs: Tuple[str, ...] = tuple(inputs)
+
+
+class TaskGraph:
+    """
+    Dependency-aware scheduler for the pipeline DAG.
+    start() launches every task at once; each one waits only on its own
+    inputs, so independent branches (e.g. company-only searches) overlap
+    with slower upstream work. Consumers await result(name) in whatever
+    order they want to report progress.
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks: Dict[str, Task] = {}
+        for task in tasks:
+            if task.name in self.tasks:
+                raise ValueError(f"Duplicate task '{task.name}'")
+            self.tasks[task.name] = task
+        self.order = self._topological_order()
+        self.timings: Dict[str, float] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def _topological_order(self) -> List[str]:
+        for task in self.tasks.values():
+            for dep in task.inputs:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on unknown task '{dep}'")
+
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Cycle detected at task '{name}'")
+            state[name] = "visiting"
+            for dep in self.tasks[name].inputs:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.tasks:
+            visit(name)
+        return order
+
+    async def _run(self, task: Task) -> Any:
+        args = [await self._running[dep] for dep in task.inputs]
+        t = time.time()
+        try:
+            return await task.fn(*args)
+        finally:
+            self.timings[task.name] = round(time.time() - t, 2)
+
+    def start(self) -> "TaskGraph":
+        for name in self.order:
+            self._running[name] = asyncio.create_task(self._run(self.tasks[name]), name=name)
+        return self
+
+    async def result(self, name: str) -> Any:
+        return await self._running[name]
+
+    async def cancel(self):
+        pending = [t for t in self._running.values() if not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        # Retrieve exceptions from branches nobody awaited so they aren't logged as lost
+        for name, t in self._running.items():
+            if t.done() and not t.cancelled() and t.exception() is not None:
+                logger.warning(f"Pipeline task '{name}' failed: {t.exception()}")
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable
+
+import httpx
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Latency distributions, as (p50, p95) seconds at latency_scale=1.0 — roughly
+# what the live APIs showed for this pipeline's request shapes.
+LATENCY_PROFILE = {
+    "tavily": (0.9, 2.5),               # basic-depth search, 5 results
+    "openai_structured": (3.5, 9.0),    # strict JSON schema extraction/analysis
+    "openai_first_token": (0.6, 1.6),   # memo stream: time to first delta
+    "openai_delta": (0.012, 0.04),      # memo stream: gap between deltas
+}
+
+DEFAULT_COMPANY = "Northwind Pay"
+
+
+class Latency:
+    """Lognormal latency fitted to a median and p95, scaled by `scale`."""
+
+    def __init__(self, p50: float, p95: float, rng: random.Random, scale: float = 1.0):
+        self.mu = math.log(p50 * scale) if p50 * scale > 0 else float("-inf")
+        self.sigma = math.log(p95 / p50) / 1.645 if p95 > p50 > 0 else 0.0
+        self.rng = rng
+
+    def sample(self) -> float:
+        if self.mu == float("-inf"):
+            return 0.0
+        return self.rng.lognormvariate(self.mu, self.sigma)
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def _substitute(template: Any, values: Dict[str, str]) -> Any:
+    """Replace {placeholders} in a fixture, JSON-escaping the values."""
+    text = json.dumps(template)
+    for key, value in values.items():
+        text = text.replace("{" + key + "}", json.dumps(value)[1:-1])
+    return json.loads(text)
+
+
+def synthesize(schema: dict) -> Any:
+    """Minimal schema-valid instance, for schemas without a recorded fixture."""
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next(k for k in kind if k != "null")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {k: synthesize(v) for k, v in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [synthesize(schema["items"])]
+    return {"string": "n/a", "integer": 5, "number": 5.0, "boolean": False}.get(kind)
+
+
+def _usage(prompt: str, completion: str) -> Dict[str, Any]:
+    input_tokens, output_tokens = len(prompt) // 4, len(completion) // 4
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens_details": {"reasoning_tokens": 0},
+    }
+
+
+def _sse(events: Iterable[Dict[str, Any]]) -> Iterable[bytes]:
+    for event in events:
+        yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+class FakeUpstreams:
+    """
+    Tavily and OpenAI stand-ins served through httpx.MockTransport. Responses
+    come from the recorded fixtures, personalised with whichever registered
+    company the request mentions; latencies are drawn from LATENCY_PROFILE.
+    """
+
+    def __init__(self, latency_scale: float = 0.1, seed: int = 7):
+        rng = random.Random(seed)
+        self.latency = {
+            name: Latency(p50, p95, rng, latency_scale) for name, (p50, p95) in LATENCY_PROFILE.items()
+        }
+        self.tavily_fixture = json.loads((FIXTURES / "tavily.json").read_text())
+        self.openai_fixtures = json.loads((FIXTURES / "openai.json").read_text())
+        self.companies: list[str] = []
+        self.requests: Counter = Counter()
+
+    def register(self, companies: Iterable[str]):
+        # Longest first so "Acme Pay" wins over "Acme"
+        self.companies = sorted(set(self.companies) | set(companies), key=len, reverse=True)
+
+    def company_in(self, text: str) -> str:
+        return next((c for c in self.companies if c in text), DEFAULT_COMPANY)
+
+    def clients(self) -> Dict[str, httpx.AsyncClient]:
+        return {
+            "tavily": httpx.AsyncClient(
+                transport=httpx.MockTransport(self.tavily), base_url="https://api.tavily.com"
+            ),
+            "openai": httpx.AsyncClient(transport=httpx.MockTransport(self.openai)),
+        }
+
+    # ── Tavily ────────────────────────────────────────────────────────────────
+
+    async def tavily(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests["tavily"] += 1
+        started = time.perf_counter()
+        await asyncio.sleep(self.latency["tavily"].sample())
+
+        query = body["query"]
+        company = self.company_in(query)
+        templates = self.tavily_fixture["results"]
+        # Deterministic per query: the same search always returns the same sources
+        offset = int.from_bytes(hashlib.blake2b(query.encode(), digest_size=4).digest(), "big")
+        picks = [templates[(offset + i) % len(templates)] for i in range(body.get("max_results", 5))]
+        values = {"company": company, "slug": _slug(company), "query": query}
+        data = {
+            "query": query,
+            "answer": _substitute(self.tavily_fixture["answer"], values) if body.get("include_answer") else None,
+            "results": _substitute(picks, values),
+            "response_time": round(time.perf_counter() - started, 2),
+        }
+        return httpx.Response(200, json=data)
+
+    # ── OpenAI ────────────────────────────────────────────────────────────────
+
+    def _fixture_slice(self, schema: dict) -> Any:
+        """A recorded fixture holding every field of `schema`, cut down to those fields."""
+        fields = list(schema.get("properties", {}))
+        for fixture in self.openai_fixtures.values():
+            if fields and isinstance(fixture, dict) and all(f in fixture for f in fields):
+                return {f: fixture[f] for f in fields}
+        return None
+
+    def _structured(self, name: str, schema: dict, prompt: str) -> str:
+        fixture = self.openai_fixtures.get(name) or self._fixture_slice(schema)
+        if fixture is None:
+            return json.dumps(synthesize(schema))
+        return json.dumps(_substitute(fixture, {"company": self.company_in(prompt)}))
+
+    async def openai(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path.endswith("/responses"):
+            prompt = body.get("input", "")
+            text_format = (body.get("text") or {}).get("format")
+            if body.get("stream"):
+                self.requests["openai_stream"] += 1
+                memo = _substitute(self.openai_fixtures["memo"], {"company": self.company_in(prompt)})
+                return httpx.Response(
+                    200,
+                    headers={"content-type": "text/event-stream"},
+                    content=self._responses_stream(prompt, memo),
+                )
+            self.requests["openai"] += 1
+            await asyncio.sleep(self.latency["openai_structured"].sample())
+            text = (
+                self._structured(text_format["name"], text_format["schema"], prompt)
+                if text_format
+                else _substitute(self.openai_fixtures["memo"], {"company": self.company_in(prompt)})
+            )
+            return httpx.Response(200, json=self._response_object(prompt, text))
+
+        if request.url.path.endswith("/chat/completions"):
+            self.requests["openai_chat"] += 1
+            prompt = body["messages"][-1]["content"]
+            response_format = (body.get("response_format") or {}).get("json_schema")
+            await asyncio.sleep(self.latency["openai_structured"].sample())
+            text = (
+                self._structured(response_format["name"], response_format["schema"], prompt)
+                if response_format
+                else _substitute(self.openai_fixtures["memo"], {"company": self.company_in(prompt)})
+            )
+            usage = _usage(prompt, text)
+            return httpx.Response(200, json={
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"],
+                          "total_tokens": usage["total_tokens"]},
+            })
+        return httpx.Response(404, json={"error": {"message": f"unknown path {request.url.path}"}})
+
+    @staticmethod
+    def _response_object(prompt: str, text: str) -> Dict[str, Any]:
+        return {
+            "id": "resp_bench", "object": "response", "created_at": int(time.time()), "model": "bench",
+            "status": "completed", "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+            "output": [{
+                "type": "message", "id": "msg_bench", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "usage": _usage(prompt, text),
+        }
+
+    async def _responses_stream(self, prompt: str, text: str) -> AsyncIterator[bytes]:
+        await asyncio.sleep(self.latency["openai_first_token"].sample())
+        deltas = re.findall(r"\S+\s*", text)
+        for i in range(0, len(deltas), 3):
+            for chunk in _sse([{
+                "type": "response.output_text.delta", "delta": "".join(deltas[i:i + 3]),
+                "item_id": "msg_bench", "output_index": 0, "content_index": 0, "sequence_number": i,
+            }]):
+                yield chunk
+            await asyncio.sleep(self.latency["openai_delta"].sample())
+        for chunk in _sse([{
+            "type": "response.completed", "sequence_number": len(deltas) + 1,
+            "response": self._response_object(prompt, text),
+        }]):
+            yield chunk
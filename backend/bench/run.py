@@ -0,0 +1,327 @@
+"""
+Offline pipeline benchmark — drives OrchestratorAgent.run and the /analyze
+endpoint against local Tavily/OpenAI stand-ins (bench/fakes.py) and writes a
+JSON report that can be diffed across commits.
+
+    cd backend
+    python -m bench.run                                   # both modes at 1, 10, 50
+    python -m bench.run --mode pipeline --concurrency 1 10 --latency-scale 0.05
+    python -m bench.run --out bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from bench.fakes import LATENCY_PROFILE, FakeUpstreams
+
+logger = logging.getLogger("bench")
+
+# Status events come in start/done pairs, in this order
+PHASES = [
+    "research",
+    "core_extraction",
+    "market_extraction",
+    "signal_extraction",
+    "graph",
+    "analysis",
+    "memo",
+]
+
+Event = Tuple[float, str, Dict[str, Any]]   # (seconds since request, event type, data)
+
+
+# ── Environment ───────────────────────────────────────────────────────────────
+
+def _isolate(respect_rate_limits: bool):
+    """Keep benchmarks off every external service, whatever .env configures."""
+    import database
+    from agents import graph, llm, orchestrator
+    import ratelimit
+
+    database.DATABASE_URL = ""
+    graph.NEO4J_ENABLED = False
+    orchestrator.NEO4J_ENABLED = False
+    llm.OPENAI_API_KEY = llm.OPENAI_API_KEY or "bench"
+    if not respect_rate_limits:
+        # The fakes never throttle — open the limiters so results measure the pipeline
+        for limiter in (ratelimit.tavily_limiter, ratelimit.openai_limiter):
+            limiter.rate = limiter.burst = limiter.tokens = 1e6
+            limiter.max_concurrency = limiter.window = 10_000
+
+
+def _reset_state():
+    """Fresh caches and graph store so every concurrency level starts cold."""
+    from cache import llm_cache, search_cache
+    from agents import graph_memory
+
+    search_cache.memory.clear()
+    llm_cache.memory.clear()
+    graph_memory.store = graph_memory.GraphStore()
+
+
+def _install(fakes: FakeUpstreams):
+    import http_client
+    http_client.clients.update(fakes.clients())
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class Sampler:
+    """Samples thread count and RSS in the background, keeping the peaks."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.threads_peak = 0
+        self.rss_peak = 0
+        self._task: asyncio.Task | None = None
+
+    def _sample(self):
+        self.threads_peak = max(self.threads_peak, threading.active_count())
+        self.rss_peak = max(self.rss_peak, _rss_bytes())
+
+    async def _run(self):
+        while True:
+            self._sample()
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self._sample()
+
+
+# ── Drivers ───────────────────────────────────────────────────────────────────
+
+async def _run_pipeline(company: str) -> List[Event]:
+    from agents.orchestrator import OrchestratorAgent
+
+    events: List[Event] = []
+    start = time.perf_counter()
+    async for event in OrchestratorAgent().run(company=company, stage="Series A", bypass_llm_cache=True):
+        events.append((time.perf_counter() - start, event["event"], event["data"]))
+    return events
+
+
+async def _run_api(client: httpx.AsyncClient, company: str) -> List[Event]:
+    events: List[Event] = []
+    start = time.perf_counter()
+    payload = {"company": company, "stage": "Series A", "exit_type": "", "bypass_llm_cache": True}
+    async with client.stream("POST", "/analyze", json=payload) as response:
+        response.raise_for_status()
+        event_type, data = "message", []
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event_type = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+            elif not line and data:
+                events.append((time.perf_counter() - start, event_type, json.loads("\n".join(data))))
+                event_type, data = "message", []
+    return events
+
+
+async def _serve_app():
+    """Run the real app under uvicorn on an ephemeral local port."""
+    import uvicorn
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+# ── Reporting ─────────────────────────────────────────────────────────────────
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(_percentile(values, 50), 4),
+        "p95": round(_percentile(values, 95), 4),
+        "max": round(max(values), 4) if values else 0.0,
+        "n": len(values),
+    }
+
+
+def _phase_durations(events: List[Event]) -> Dict[str, float]:
+    """Wall time from each phase's start status to its done status."""
+    durations: Dict[str, float] = {}
+    opened_at: float | None = None
+    for t, event_type, data in events:
+        if event_type != "status":
+            continue
+        if data.get("icon") != "check":
+            opened_at = t if opened_at is None else opened_at
+        elif opened_at is not None and len(durations) < len(PHASES):
+            durations[PHASES[len(durations)]] = t - opened_at
+            opened_at = None
+    return durations
+
+
+def _level_report(mode: str, concurrency: int, runs: List[List[Event] | BaseException],
+                  wall: float, sampler: Sampler, fakes: FakeUpstreams, requests_before) -> Dict[str, Any]:
+    import ratelimit
+
+    ok = [r for r in runs if not isinstance(r, BaseException) and any(e[1] == "complete" for e in r)]
+    errors = [r for r in runs if r not in ok]
+    phases: Dict[str, List[float]] = {name: [] for name in PHASES}
+    for events in ok:
+        for name, seconds in _phase_durations(events).items():
+            phases[name].append(seconds)
+    first_delta = [next(t for t, kind, _ in r if kind == "memo_delta") for r in ok
+                   if any(kind == "memo_delta" for _, kind, _ in r)]
+    analysis_ready = [next(t for t, kind, _ in r if kind == "analysis_ready") for r in ok
+                      if any(kind == "analysis_ready" for _, kind, _ in r)]
+    total_events = sum(len(r) for r in runs if not isinstance(r, BaseException))
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "runs": len(runs),
+        "errors": len(errors),
+        "error_samples": [repr(e) for e in errors if isinstance(e, BaseException)][:3],
+        "wall_s": round(wall, 3),
+        "end_to_end_s": _summary([r[-1][0] for r in ok]),
+        "time_to_first_event_s": _summary([r[0][0] for r in ok]),
+        "time_to_analysis_ready_s": _summary(analysis_ready),
+        "time_to_first_memo_delta_s": _summary(first_delta),
+        "phases_s": {name: _summary(values) for name, values in phases.items()},
+        "events": total_events,
+        "events_per_sec": round(total_events / wall, 1) if wall else 0.0,
+        "threads_peak": sampler.threads_peak,
+        "rss_peak_mb": round(sampler.rss_peak / 2**20, 1),
+        "upstream_requests": dict(fakes.requests - requests_before),
+        "limiters": ratelimit.limiter_stats(),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+
+async def _level(mode: str, concurrency: int, fakes: FakeUpstreams, client: httpx.AsyncClient | None):
+    _reset_state()
+    companies = [f"Benchco {mode[0].upper()}{concurrency}-{i:03d}" for i in range(concurrency)]
+    fakes.register(companies)
+    requests_before = fakes.requests.copy()
+    with Sampler() as sampler:
+        start = time.perf_counter()
+        if mode == "pipeline":
+            runs = await asyncio.gather(*(_run_pipeline(c) for c in companies), return_exceptions=True)
+        else:
+            runs = await asyncio.gather(*(_run_api(client, c) for c in companies), return_exceptions=True)
+        wall = time.perf_counter() - start
+    report = _level_report(mode, concurrency, runs, wall, sampler, fakes, requests_before)
+    print(
+        f"{mode:<8} c={concurrency:<3} e2e p50={report['end_to_end_s']['p50']:.2f}s "
+        f"p95={report['end_to_end_s']['p95']:.2f}s  wall={report['wall_s']:.2f}s  "
+        f"events/s={report['events_per_sec']:<7} threads={report['threads_peak']:<3} "
+        f"rss={report['rss_peak_mb']}MB  errors={report['errors']}",
+        flush=True,
+    )
+    return report
+
+
+async def run(args) -> Dict[str, Any]:
+    from agents import corpus
+    _isolate(args.respect_rate_limits)
+    await asyncio.to_thread(corpus.load_tokenizer)   # one-off cost, kept out of the first level
+    fakes = FakeUpstreams(latency_scale=args.latency_scale, seed=args.seed)
+    _install(fakes)
+
+    results = []
+    if "pipeline" in args.mode:
+        for concurrency in args.concurrency:
+            results.append(await _level("pipeline", concurrency, fakes, None))
+
+    if "api" in args.mode:
+        server, task, base_url = await _serve_app()
+        _install(fakes)   # the lifespan doesn't create clients, but make sure the fakes are in place
+        try:
+            limits = httpx.Limits(max_connections=max(args.concurrency) + 10)
+            async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+                for concurrency in args.concurrency:
+                    results.append(await _level("api", concurrency, fakes, client))
+        finally:
+            server.should_exit = True
+            await task
+
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "latency_scale": args.latency_scale,
+            "seed": args.seed,
+            "respect_rate_limits": args.respect_rate_limits,
+            "latency_profile_s": LATENCY_PROFILE,
+        },
+        "peak_rss_process_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline DealScope pipeline benchmark")
+    parser.add_argument("--mode", nargs="+", choices=["pipeline", "api"], default=["pipeline", "api"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="multiplier on the recorded upstream latency profile (1.0 = live-like)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--respect-rate-limits", action="store_true",
+                        help="keep the configured Tavily/OpenAI limiters instead of opening them up")
+    parser.add_argument("--out", default="", help="report path (default bench/results/<commit>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    out = Path(args.out or Path(__file__).parent / "results" / f"{report['commit']}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
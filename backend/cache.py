@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+import database
+from config import (
+    SEARCH_CACHE_TTL_NEWS,
+    SEARCH_CACHE_TTL_GENERAL,
+    SEARCH_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_ROWS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable SHA-256 key for any JSON-serialisable combination of inputs."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Bounded in-process LRU where every entry carries its own expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> int:
+        count = len(self._data)
+        self._data.clear()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SearchCache:
+    """
+    Two-tier cache for raw Tavily responses.
+    Tier 1 is a per-process LRU; tier 2 is the shared Postgres `search_cache`
+    table, so warm entries survive restarts and are shared across workers.
+    """
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.memory = LRUCache(max_entries)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def ttl_for(topic: str) -> int:
+        return SEARCH_CACHE_TTL_NEWS if topic == "news" else SEARCH_CACHE_TTL_GENERAL
+
+    @staticmethod
+    def key_for(query: str, topic: str, params: dict) -> str:
+        return cache_key("tavily", query.strip().lower(), topic, params)
+
+    async def get(self, query: str, topic: str, params: dict) -> dict | None:
+        key = self.key_for(query, topic, params)
+        response = self.memory.get(key)
+        if response is not None:
+            self.memory_hits += 1
+            return response
+
+        cached = await database.get_cached_search(key)
+        if cached is not None:
+            response, ttl = cached
+            self.memory.set(key, response, ttl)
+            self.db_hits += 1
+            return response
+
+        self.misses += 1
+        return None
+
+    async def set(self, query: str, topic: str, params: dict, response: dict) -> None:
+        key = self.key_for(query, topic, params)
+        ttl = self.ttl_for(topic)
+        self.memory.set(key, response, ttl)
+        await database.save_cached_search(key, topic, response, ttl)
+
+    async def purge(self, expired_only: bool = False) -> dict:
+        memory_cleared = 0 if expired_only else self.memory.clear()
+        db_deleted = await database.purge_search_cache(expired_only=expired_only)
+        logger.info(f"Search cache purged — memory: {memory_cleared}, postgres: {db_deleted}")
+        return {"memory_cleared": memory_cleared, "db_deleted": db_deleted}
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "ttl_news": SEARCH_CACHE_TTL_NEWS,
+            "ttl_general": SEARCH_CACHE_TTL_GENERAL,
+        }
+
+
+class LLMCache:
+    """
+    Content-addressed cache for structured LLM responses. Keys hash the
+    model, instructions, schema and input text, so entries never go stale —
+    they are only evicted by size (LRU in memory, last-used order in Postgres).
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, max_rows: int = LLM_CACHE_MAX_ROWS):
+        self.memory = LRUCache(max_entries)
+        self.max_rows = max_rows
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(model: str, instructions: str, schema: dict, content: str) -> str:
+        return cache_key("llm", model, instructions, schema, content)
+
+    async def get(self, key: str) -> dict | None:
+        response = self.memory.get(key)
+        if response is not None:
+            self.memory_hits += 1
+            return response
+
+        response = await database.get_cached_llm(key)
+        if response is not None:
+            self.memory.set(key, response, float("inf"))
+            self.db_hits += 1
+            return response
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, schema_name: str, response: dict) -> None:
+        self.memory.set(key, response, float("inf"))
+        await database.save_cached_llm(key, schema_name, response, self.max_rows)
+
+    async def purge(self) -> dict:
+        memory_cleared = self.memory.clear()
+        db_deleted = await database.purge_llm_cache()
+        logger.info(f"LLM cache purged — memory: {memory_cleared}, postgres: {db_deleted}")
+        return {"memory_cleared": memory_cleared, "db_deleted": db_deleted}
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "max_rows": self.max_rows,
+        }
+
+
+search_cache = SearchCache()
+llm_cache = LLMCache()
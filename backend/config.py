@@ -13,8 +13,37 @@ else:
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# Stream the investment memo to the client as `memo_delta` SSE events
+MEMO_STREAMING = os.getenv("MEMO_STREAMING", "true").lower() not in ("0", "false", "no")
+# Split investment analysis into concurrent per-section calls (red flags, comps,
+# acquirers, exit scores) instead of one call producing the whole schema. Off by
+# default: it quadruples the analysis calls and re-sends shared context to each
+ANALYSIS_FANOUT = os.getenv("ANALYSIS_FANOUT", "false").lower() not in ("0", "false", "no")
+# Pooled connections shared by every in-flight OpenAI call in this worker
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+# Admission control for OpenAI, same shape as the Tavily limiter below
+OPENAI_RATE = float(os.getenv("OPENAI_RATE", "20"))
+OPENAI_BURST = int(os.getenv("OPENAI_BURST", "40"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+# USD per million tokens, for the run cost estimate (defaults: gpt-4o list prices)
+OPENAI_PRICE_INPUT = float(os.getenv("OPENAI_PRICE_INPUT", "2.50"))
+OPENAI_PRICE_CACHED_INPUT = float(os.getenv("OPENAI_PRICE_CACHED_INPUT", "1.25"))
+OPENAI_PRICE_OUTPUT = float(os.getenv("OPENAI_PRICE_OUTPUT", "10.00"))
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+# Pooled keep-alive connections to the Tavily host, shared by every pipeline
+TAVILY_MAX_CONNECTIONS = int(os.getenv("TAVILY_MAX_CONNECTIONS", "20"))
+TAVILY_MAX_KEEPALIVE = int(os.getenv("TAVILY_MAX_KEEPALIVE", "10"))
+TAVILY_TIMEOUT = float(os.getenv("TAVILY_TIMEOUT", "30"))
+# Process-wide admission control: requests/sec, burst size, concurrency ceiling,
+# and how many times a throttled (429/432) search is re-queued before giving up
+TAVILY_RATE = float(os.getenv("TAVILY_RATE", "10"))
+TAVILY_BURST = int(os.getenv("TAVILY_BURST", "20"))
+TAVILY_MAX_CONCURRENCY = int(os.getenv("TAVILY_MAX_CONCURRENCY", "16"))
+TAVILY_MAX_RETRIES = int(os.getenv("TAVILY_MAX_RETRIES", "4"))
 
 NEO4J_URI = os.getenv("NEO4J_URI", "")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -23,5 +52,43 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "")
 # Whether Neo4j is available — agent degrades gracefully if not
 NEO4J_ENABLED = bool(NEO4J_URI and NEO4J_PASSWORD)
 
+# Graph engine for insights: "memory" (in-process store, seeded from saved
+# analyses, with Neo4j as a write-behind mirror when configured) or "neo4j"
+GRAPH_ENGINE = os.getenv("GRAPH_ENGINE", "memory").lower()
+GRAPH_SEED_LIMIT = int(os.getenv("GRAPH_SEED_LIMIT", "500"))   # saved analyses loaded at startup
+GRAPH_MAX_COMPANIES = int(os.getenv("GRAPH_MAX_COMPANIES", "2000"))   # analysed companies kept, least recently used evicted
+
 # Optional Postgres URL — enables analysis history and analyst preferences persistence
 DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+# Tavily search result cache — TTLs in seconds, per Tavily topic
+SEARCH_CACHE_TTL_NEWS = int(os.getenv("SEARCH_CACHE_TTL_NEWS", "3600"))
+SEARCH_CACHE_TTL_GENERAL = int(os.getenv("SEARCH_CACHE_TTL_GENERAL", "86400"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+
+# Content-addressed cache for structured LLM extraction responses
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))   # in-process LRU
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "5000"))        # Postgres size cap
+
+# Background analysis jobs — events kept per job for reconnect replay, and how
+# long a finished job stays resumable (seconds)
+JOB_EVENT_LOG_SIZE = int(os.getenv("JOB_EVENT_LOG_SIZE", "5000"))
+JOB_TTL = int(os.getenv("JOB_TTL", "900"))
+
+# Optional shared secret for /admin endpoints (open when unset, like the rest of the API)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Extraction corpus builder — token budget per extraction schema, and the
+# estimated Jaccard similarity above which two sources count as duplicates
+CORPUS_BUDGET_CORE = int(os.getenv("CORPUS_BUDGET_CORE", "6000"))
+CORPUS_BUDGET_MARKET = int(os.getenv("CORPUS_BUDGET_MARKET", "8000"))
+CORPUS_BUDGET_SIGNALS = int(os.getenv("CORPUS_BUDGET_SIGNALS", "6000"))
+CORPUS_DEDUP_THRESHOLD = float(os.getenv("CORPUS_DEDUP_THRESHOLD", "0.7"))
+
+# Map-reduce extraction — corpora larger than EXTRACTION_CHUNK_TOKENS are split
+# on source boundaries and extracted concurrently, then merged. The default is
+# about half the smallest corpus budget, so a full core corpus runs as two
+# concurrent calls and a full market corpus as three.
+EXTRACTION_CHUNKING = os.getenv("EXTRACTION_CHUNKING", "true").lower() not in ("0", "false", "no")
+EXTRACTION_CHUNK_TOKENS = int(os.getenv("EXTRACTION_CHUNK_TOKENS", "3000"))
@@ -1,10 +1,19 @@
-import json
+import asyncio
+import base64
 import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+import jsoncodec
 from config import DATABASE_URL
+from metrics import DB_POOL_WAIT_SECONDS
 
 logger = logging.getLogger(__name__)
 
 pool = None
+# False until the full-text search column and index exist; the rest of the
+# database works without them
+search_available = False
 
 _CREATE_TABLE = """
 CREATE TABLE IF NOT EXISTS analyses (
@@ -14,8 +23,40 @@ CREATE TABLE IF NOT EXISTS analyses (
     created_at   TIMESTAMPTZ DEFAULT NOW(),
     result_json  JSONB NOT NULL
 );
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS usage JSONB;
 """
 
+# History is listed newest-first and paged by (created_at, id); each filter
+# gets an index that leads with its column and ends in the same sort order.
+_CREATE_ANALYSES_INDEXES = """
+CREATE INDEX IF NOT EXISTS analyses_created_id_idx
+    ON analyses (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS analyses_company_prefix_idx
+    ON analyses (lower(company_name) text_pattern_ops, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS analyses_sector_created_idx
+    ON analyses (lower(sector), created_at DESC, id DESC);
+"""
+
+# Full-text search document, kept in step with each row by Postgres itself.
+# Weights rank company and acquirer names above sector and red flags, and
+# those above the memo body.
+_CREATE_ANALYSES_SEARCH = """
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(company_name, '')), 'A')
+    || setweight(jsonb_to_tsvector(
+           'english',
+           jsonb_path_query_array(result_json, '$.likely_acquirers[*].name')
+           || jsonb_path_query_array(result_json, '$.comps_table[*].acquirer'),
+           '["string"]'), 'A')
+    || setweight(to_tsvector('english', coalesce(sector, '')), 'B')
+    || setweight(jsonb_to_tsvector(
+           'english', jsonb_path_query_array(result_json, '$.red_flags[*].signal'), '["string"]'), 'B')
+    || setweight(to_tsvector('english', coalesce(result_json->>'memo', '')), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS analyses_search_idx ON analyses USING gin (search_tsv);
+"""
+
+
 _CREATE_PREFERENCES_TABLE = """
 CREATE TABLE IF NOT EXISTS preferences (
     id                INTEGER PRIMARY KEY DEFAULT 1,
@@ -27,9 +68,48 @@ VALUES (1, '')
 ON CONFLICT (id) DO NOTHING;
 """
 
+_CREATE_SEARCH_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    cache_key    TEXT PRIMARY KEY,
+    topic        TEXT NOT NULL,
+    response     JSONB NOT NULL,
+    expires_at   TIMESTAMPTZ NOT NULL
+);
+"""
+_CREATE_LLM_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    cache_key     TEXT PRIMARY KEY,
+    schema_name   TEXT NOT NULL,
+    response      JSONB NOT NULL,
+    created_at    TIMESTAMPTZ DEFAULT NOW(),
+    last_used_at  TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_used_idx ON llm_cache (last_used_at DESC);
+"""
+
+
+@asynccontextmanager
+async def _acquire():
+    """pool.acquire(), recording how long the caller waited for a connection."""
+    start = time.perf_counter()
+    async with pool.acquire() as conn:
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        yield conn
+
+
+async def _init_connection(conn):
+    """JSONB in and out as Python objects, through orjson, on every pooled connection."""
+    await conn.set_type_codec(
+        "jsonb",
+        schema="pg_catalog",
+        encoder=jsoncodec.encode_jsonb,
+        decoder=jsoncodec.decode_jsonb,
+        format="binary",
+    )
+
 
 async def init_pool():
-    global pool
+    global pool, search_available, _listener_task
     if not DATABASE_URL:
         logger.info("DATABASE_URL not set — history persistence disabled")
         return
@@ -37,37 +117,133 @@ async def init_pool():
         import asyncpg
         # Render provides postgres:// — asyncpg accepts both schemes
         url = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-        pool = await asyncpg.create_pool(url, min_size=1, max_size=5)
-        async with pool.acquire() as conn:
+        pool = await asyncpg.create_pool(url, min_size=1, max_size=5, init=_init_connection)
+        async with _acquire() as conn:
             await conn.execute(_CREATE_TABLE)
+            await conn.execute(_CREATE_ANALYSES_INDEXES)
             await conn.execute(_CREATE_PREFERENCES_TABLE)
+            await conn.execute(_CREATE_SEARCH_CACHE_TABLE)
+            await conn.execute(_CREATE_LLM_CACHE_TABLE)
         logger.info("Database pool initialised")
     except Exception as e:
         logger.warning(f"Database init failed — history disabled: {e}")
         pool = None
+        return
+    # Separate so a failure here (permissions, an older Postgres, a lock
+    # timeout on the ALTER) only turns off search
+    try:
+        async with _acquire() as conn:
+            await conn.execute(_CREATE_ANALYSES_SEARCH)
+        search_available = True
+    except Exception as e:
+        logger.warning(f"Full-text search setup failed — /analyses/search disabled: {e}")
+    _listener_task = asyncio.create_task(_run_preferences_listener())
 
 
 async def close_pool():
-    global pool
+    global pool, search_available
+    await _stop_preferences_listener()
+    search_available = False
     if pool:
         await pool.close()
         pool = None
 
 
-async def save_analysis(company_name: str, sector: str, result: dict) -> dict | None:
+# ── Preferences cache ─────────────────────────────────────────────────────────
+# The single preferences row is cached per worker. save_preferences NOTIFYs the
+# new text on PREFERENCES_CHANNEL in the same transaction as the write, and a
+# dedicated LISTEN connection (outside the pool) applies it to every worker's
+# cache. The cache is only trusted while that connection is up; when it drops,
+# reads go to the database until the listener reconnects.
+
+PREFERENCES_CHANNEL = "dealscope_preferences"
+
+_listener = None                                  # asyncpg.Connection holding the LISTEN
+_listener_task: asyncio.Task | None = None        # reconnect loop
+_preferences: str | None = None                   # None = not cached
+_preferences_version = 0                          # bumped on every invalidation
+
+
+def _set_preferences(text: str | None):
+    global _preferences, _preferences_version
+    _preferences = text
+    _preferences_version += 1
+
+
+def _on_preferences_notify(conn, pid, channel, payload):
+    _set_preferences(payload)
+
+
+def _on_listener_lost(conn):
+    global _listener, _listener_task
+    if conn is not _listener:
+        return
+    logger.warning("Preferences listener connection lost — cache disabled until it reconnects")
+    _listener = None
+    _set_preferences(None)
+    if pool is not None and (_listener_task is None or _listener_task.done()):
+        _listener_task = asyncio.get_running_loop().create_task(_run_preferences_listener())
+
+
+async def _connect_preferences_listener():
+    global _listener
+    import asyncpg
+    url = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    conn = await asyncpg.connect(url)
+    await conn.add_listener(PREFERENCES_CHANNEL, _on_preferences_notify)
+    conn.add_termination_listener(_on_listener_lost)
+    _listener = conn
+    # Anything saved while we weren't listening was missed — start cold
+    _set_preferences(None)
+
+
+async def _run_preferences_listener():
+    """Connect the LISTEN connection, retrying with backoff until it's up."""
+    delay = 1.0
+    while pool is not None:
+        try:
+            await _connect_preferences_listener()
+            logger.info(f"Listening for preference changes on '{PREFERENCES_CHANNEL}'")
+            return
+        except Exception as e:
+            logger.warning(f"Preferences listener connect failed (retrying in {delay:.0f}s): {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+
+async def _stop_preferences_listener():
+    global _listener, _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        _listener_task = None
+    conn, _listener = _listener, None
+    _set_preferences(None)
+    if conn is not None:
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+def preferences_cache_state() -> dict:
+    return {"listening": _listener is not None, "cached": _preferences is not None}
+
+
+async def save_analysis(company_name: str, sector: str, result: dict, usage: dict | None = None) -> dict | None:
     if not pool:
         return None
     try:
-        async with pool.acquire() as conn:
+        async with _acquire() as conn:
             row = await conn.fetchrow(
                 """
-                INSERT INTO analyses (company_name, sector, result_json)
-                VALUES ($1, $2, $3)
+                INSERT INTO analyses (company_name, sector, result_json, usage)
+                VALUES ($1, $2, $3, $4)
                 RETURNING id, created_at
                 """,
                 company_name,
                 sector or "",
-                json.dumps(result),
+                result,
+                usage,
             )
             return {"id": row["id"], "created_at": row["created_at"].isoformat()}
     except Exception as e:
@@ -75,18 +251,131 @@ async def save_analysis(company_name: str, sector: str, result: dict) -> dict |
         return None
 
 
-async def get_analyses(limit: int = 20) -> list[dict]:
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque keyset cursor for the history row (created_at, id)."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor — raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+def _prefix_bounds(prefix: str) -> tuple[str, str]:
+    """
+    [low, high) range holding every string that starts with `prefix`, in
+    byte order. Compared with the text_pattern_ops operators (~>=~ / ~<~)
+    this stays indexable in the generic plans asyncpg's prepared statements
+    end up on, which a parameterised LIKE does not.
+    """
+    prefix = prefix.lower()
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+async def get_analyses(
+    limit: int = 20,
+    cursor: str | None = None,
+    company: str | None = None,
+    sector: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    One page of history, newest first, and the cursor for the next page
+    (None on the last). Paging seeks past the cursor's (created_at, id)
+    instead of using OFFSET, so every page costs the same at any table size.
+    `company` matches a case-insensitive name prefix; `since` is inclusive
+    and `until` exclusive. Raises ValueError for a malformed cursor.
+    """
+    conditions, args = [], []
+
+    def param(value) -> str:
+        args.append(value)
+        return f"${len(args)}"
+
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        conditions.append(f"(created_at, id) < ({param(created_at)}, {param(id)})")
+    if company:
+        low, high = _prefix_bounds(company)
+        conditions.append(f"lower(company_name) ~>=~ {param(low)} AND lower(company_name) ~<~ {param(high)}")
+    if sector:
+        conditions.append(f"lower(sector) = lower({param(sector)})")
+    if since:
+        conditions.append(f"created_at >= {param(since)}")
+    if until:
+        conditions.append(f"created_at < {param(until)}")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     if not pool:
-        return []
+        return [], None
+
     try:
-        async with pool.acquire() as conn:
+        async with _acquire() as conn:
             rows = await conn.fetch(
-                """
+                f"""
                 SELECT id, company_name, sector, created_at
                 FROM analyses
-                ORDER BY created_at DESC
-                LIMIT $1
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT {param(limit + 1)}
+                """,
+                *args,
+            )
+    except Exception as e:
+        logger.warning(f"get_analyses failed: {e}")
+        return [], None
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+    return [
+        {
+            "id": r["id"],
+            "company_name": r["company_name"],
+            "sector": r["sector"],
+            "created_at": r["created_at"].isoformat(),
+        }
+        for r in page
+    ], next_cursor
+
+
+async def search_analyses(q: str, limit: int = 20) -> list[dict]:
+    """
+    Saved analyses matching a web-search style query ("stripe acquirer",
+    "fraud -crypto", quoted phrases), best match first. The GIN index finds
+    and ranks the matches; ts_headline, which re-parses the memo, only runs
+    on the rows being returned.
+    """
+    if not pool or not search_available:
+        return []
+    try:
+        async with _acquire() as conn:
+            rows = await conn.fetch(
+                """
+                WITH query AS (SELECT websearch_to_tsquery('english', $1) AS tsq),
+                ranked AS (
+                    SELECT a.id, a.company_name, a.sector, a.created_at, a.result_json,
+                           ts_rank_cd(a.search_tsv, query.tsq) AS rank
+                    FROM analyses a, query
+                    WHERE a.search_tsv @@ query.tsq
+                    ORDER BY rank DESC, a.created_at DESC
+                    LIMIT $2
+                )
+                SELECT r.id, r.company_name, r.sector, r.created_at, r.rank,
+                       ts_headline(
+                           'english', coalesce(r.result_json->>'memo', ''), query.tsq,
+                           'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10'
+                       ) AS snippet,
+                       jsonb_path_query_array(r.result_json, '$.likely_acquirers[*].name') AS acquirers,
+                       jsonb_path_query_array(r.result_json, '$.red_flags[*].signal') AS red_flags
+                FROM ranked r, query
+                ORDER BY r.rank DESC, r.created_at DESC
                 """,
+                q,
                 limit,
             )
             return [
@@ -95,22 +384,32 @@ async def get_analyses(limit: int = 20) -> list[dict]:
                     "company_name": r["company_name"],
                     "sector": r["sector"],
                     "created_at": r["created_at"].isoformat(),
+                    "rank": round(r["rank"], 4),
+                    "snippet": r["snippet"],
+                    "acquirers": r["acquirers"],
+                    "red_flags": r["red_flags"],
                 }
                 for r in rows
             ]
     except Exception as e:
-        logger.warning(f"get_analyses failed: {e}")
+        logger.warning(f"search_analyses failed: {e}")
         return []
 
 
-async def get_analysis(id: int) -> dict | None:
+async def get_analysis_json(id: int) -> bytes | None:
+    """
+    The saved analysis as a ready-to-send JSON body. The result and usage
+    columns are read as Postgres' own JSON text and spliced in verbatim, so
+    the (large) result is never decoded into Python or re-encoded.
+    """
     if not pool:
         return None
     try:
-        async with pool.acquire() as conn:
+        async with _acquire() as conn:
             row = await conn.fetchrow(
                 """
-                SELECT id, company_name, sector, created_at, result_json
+                SELECT id, company_name, sector, created_at,
+                       result_json::text AS result, usage::text AS usage
                 FROM analyses
                 WHERE id = $1
                 """,
@@ -118,23 +417,54 @@ async def get_analysis(id: int) -> dict | None:
             )
             if not row:
                 return None
-            return {
+            head = jsoncodec.dumps({
                 "id": row["id"],
                 "company_name": row["company_name"],
                 "sector": row["sector"],
                 "created_at": row["created_at"].isoformat(),
-                "result": json.loads(row["result_json"]),
-            }
+            })
+            return b"".join((
+                head[:-1],
+                b',"result":', row["result"].encode(),
+                b',"usage":', (row["usage"] or "null").encode(),
+                b"}",
+            ))
     except Exception as e:
-        logger.warning(f"get_analysis failed: {e}")
+        logger.warning(f"get_analysis_json failed: {e}")
         return None
 
 
+async def get_graph_seed(limit: int) -> list[dict]:
+    """Company name plus the graph-relevant parts of the most recent saved results."""
+    if not pool:
+        return []
+    try:
+        async with _acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT company_name,
+                       jsonb_build_object(
+                           'market_info', result_json->'market_info',
+                           'comps_table', result_json->'comps_table',
+                           'investor_overlaps', result_json->'investor_overlaps'
+                       ) AS result
+                FROM analyses
+                ORDER BY created_at DESC
+                LIMIT $1
+                """,
+                limit,
+            )
+            return [{"company_name": r["company_name"], "result": r["result"]} for r in rows]
+    except Exception as e:
+        logger.warning(f"get_graph_seed failed: {e}")
+        return []
+
+
 async def delete_analysis(id: int) -> bool:
     if not pool:
         return False
     try:
-        async with pool.acquire() as conn:
+        async with _acquire() as conn:
             result = await conn.execute("DELETE FROM analyses WHERE id = $1", id)
             return result == "DELETE 1"
     except Exception as e:
@@ -145,12 +475,20 @@ async def delete_analysis(id: int) -> bool:
 async def get_preferences() -> str:
     if not pool:
         return ""
+    if _preferences is not None and _listener is not None:
+        return _preferences
+    version = _preferences_version
     try:
-        async with pool.acquire() as conn:
+        async with _acquire() as conn:
             row = await conn.fetchrow(
                 "SELECT memo_preferences FROM preferences WHERE id = 1"
             )
-            return row["memo_preferences"] if row else ""
+        text = row["memo_preferences"] if row else ""
+        # Only cache if no change arrived while we were reading, and only while
+        # the listener is up to tell us about the next one
+        if _listener is not None and version == _preferences_version:
+            _set_preferences(text)
+        return text
     except Exception as e:
         logger.warning(f"get_preferences failed: {e}")
         return ""
@@ -162,17 +500,150 @@ async def save_preferences(text: str) -> bool:
     try:
         # Cap at 500 chars server-side as a safety net
         safe_text = text.strip()[:500]
-        async with pool.acquire() as conn:
+        async with _acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    INSERT INTO preferences (id, memo_preferences, updated_at)
+                    VALUES (1, $1, NOW())
+                    ON CONFLICT (id) DO UPDATE
+                      SET memo_preferences = $1, updated_at = NOW()
+                    """,
+                    safe_text,
+                )
+                # Delivered to every other worker's listener on commit
+                await conn.execute("SELECT pg_notify($1, $2)", PREFERENCES_CHANNEL, safe_text)
+        # This worker sees its own write straight away, not when the NOTIFY echoes back
+        _set_preferences(safe_text)
+        return True
+    except Exception as e:
+        logger.warning(f"save_preferences failed: {e}")
+        return False
+
+
+async def get_cached_search(cache_key: str) -> tuple[dict, float] | None:
+    """Return (response, seconds_to_live) for an unexpired cache row, else None."""
+    if not pool:
+        return None
+    try:
+        async with _acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT response, EXTRACT(EPOCH FROM expires_at - NOW()) AS ttl
+                FROM search_cache
+                WHERE cache_key = $1 AND expires_at > NOW()
+                """,
+                cache_key,
+            )
+            if not row:
+                return None
+            return row["response"], float(row["ttl"])
+    except Exception as e:
+        logger.warning(f"get_cached_search failed: {e}")
+        return None
+
+
+async def save_cached_search(cache_key: str, topic: str, response: dict, ttl: int) -> bool:
+    if not pool:
+        return False
+    try:
+        async with _acquire() as conn:
             await conn.execute(
                 """
-                INSERT INTO preferences (id, memo_preferences, updated_at)
-                VALUES (1, $1, NOW())
-                ON CONFLICT (id) DO UPDATE
-                  SET memo_preferences = $1, updated_at = NOW()
+                INSERT INTO search_cache (cache_key, topic, response, expires_at)
+                VALUES ($1, $2, $3, NOW() + make_interval(secs => $4))
+                ON CONFLICT (cache_key) DO UPDATE
+                  SET response = $3, expires_at = NOW() + make_interval(secs => $4)
                 """,
-                safe_text,
+                cache_key,
+                topic,
+                response,
+                float(ttl),
             )
         return True
     except Exception as e:
-        logger.warning(f"save_preferences failed: {e}")
+        logger.warning(f"save_cached_search failed: {e}")
+        return False
+
+
+async def purge_search_cache(expired_only: bool = False) -> int:
+    """Delete cached search rows; returns the number of rows removed."""
+    if not pool:
+        return 0
+    try:
+        async with _acquire() as conn:
+            if expired_only:
+                result = await conn.execute("DELETE FROM search_cache WHERE expires_at <= NOW()")
+            else:
+                result = await conn.execute("DELETE FROM search_cache")
+            return int(result.split()[-1])
+    except Exception as e:
+        logger.warning(f"purge_search_cache failed: {e}")
+        return 0
+
+
+async def get_cached_llm(cache_key: str) -> dict | None:
+    """Return a cached LLM response and bump its recency for LRU eviction."""
+    if not pool:
+        return None
+    try:
+        async with _acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                UPDATE llm_cache SET last_used_at = NOW()
+                WHERE cache_key = $1
+                RETURNING response
+                """,
+                cache_key,
+            )
+            return row["response"] if row else None
+    except Exception as e:
+        logger.warning(f"get_cached_llm failed: {e}")
+        return None
+
+
+async def save_cached_llm(cache_key: str, schema_name: str, response: dict, max_rows: int) -> bool:
+    """Upsert a response, then evict least-recently-used rows beyond max_rows."""
+    if not pool:
+        return False
+    try:
+        async with _acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    INSERT INTO llm_cache (cache_key, schema_name, response)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (cache_key) DO UPDATE
+                      SET response = $3, last_used_at = NOW()
+                    """,
+                    cache_key,
+                    schema_name,
+                    response,
+                )
+                await conn.execute(
+                    """
+                    DELETE FROM llm_cache
+                    WHERE cache_key IN (
+                        SELECT cache_key FROM llm_cache
+                        ORDER BY last_used_at DESC
+                        OFFSET $1
+                    )
+                    """,
+                    max_rows,
+                )
+        return True
+    except Exception as e:
+        logger.warning(f"save_cached_llm failed: {e}")
         return False
+
+
+async def purge_llm_cache() -> int:
+    if not pool:
+        return 0
+    try:
+        async with _acquire() as conn:
+            result = await conn.execute("DELETE FROM llm_cache")
+            return int(result.split()[-1])
+    except Exception as e:
+        logger.warning(f"purge_llm_cache failed: {e}")
+        return 0
@@ -0,0 +1,40 @@
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# One keep-alive client per upstream host, created on first use and closed in
+# the app lifespan. httpx limits are per client, so per-host limits fall out
+# of keeping a separate client for each upstream.
+clients: dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(
+    name: str,
+    base_url: str = "",
+    max_connections: int = 20,
+    max_keepalive: int = 10,
+    timeout: float = 30.0,
+) -> httpx.AsyncClient:
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+            ),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+        )
+        clients[name] = client
+        logger.info(f"HTTP client '{name}' created (max {max_connections} connections)")
+    return client
+
+
+async def close_clients():
+    for name, client in list(clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Closing HTTP client '{name}' failed: {e}")
+    clients.clear()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import AsyncGenerator, Dict, List, Tuple
+
+import jsoncodec
+from config import JOB_EVENT_LOG_SIZE, JOB_TTL
+from metrics import STREAM_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+# Events a late or reconnecting client needs to rebuild the result. They're
+# kept outside the bounded log too, so a long run of memo_delta events can't
+# push them out of replay.
+PINNED_EVENTS = frozenset({"job", "entities_ready", "market_ready", "graph_ready", "analysis_ready"})
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+class Job:
+    """
+    One pipeline run, executed in a background task independent of any HTTP
+    connection. Events are numbered and kept in a bounded log so subscribers
+    that attach late — or reconnect with Last-Event-ID — get the history
+    replayed before following the live stream.
+    """
+
+    def __init__(self, key: Tuple, company: str, stage: str, exit_type: str, bypass_llm_cache: bool):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.company = company
+        self.stage = stage
+        self.exit_type = exit_type
+        self.bypass_llm_cache = bypass_llm_cache
+        self.events: deque = deque(maxlen=JOB_EVENT_LOG_SIZE)
+        self.pinned: List[dict] = []
+        self.last_event_id = 0
+        self.done = False
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"pipeline:{self.id}")
+
+    async def _publish(self, event: dict):
+        self.last_event_id += 1
+        # Encoded once here, then reused by every subscriber and every replay
+        logged = {"id": self.last_event_id, **event, "encoded": jsoncodec.dumps_str(event["data"])}
+        self.events.append(logged)
+        if event["event"] in PINNED_EVENTS:
+            self.pinned.append(logged)
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _run(self):
+        from agents.orchestrator import OrchestratorAgent
+        await self._publish({"event": "job", "data": {"job_id": self.id}})
+        try:
+            async for event in OrchestratorAgent().run(
+                company=self.company,
+                stage=self.stage,
+                exit_type=self.exit_type,
+                bypass_llm_cache=self.bypass_llm_cache,
+            ):
+                await self._publish(event)
+        except Exception as e:
+            logger.exception(f"Pipeline error for '{self.company}': {e}")
+            await self._publish({"event": "error", "data": {"message": str(e)}})
+        finally:
+            self.done = True
+            self.finished_at = time.time()
+            async with self._changed:
+                self._changed.notify_all()
+            _finished(self)
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncGenerator[dict, None]:
+        """
+        Replay events after last_event_id, then follow live events until the
+        run ends. If the log has already dropped some of those events, the
+        pinned ones among them are replayed first, then the log from the
+        oldest event still held.
+        """
+        self.subscribers += 1
+        STREAM_SUBSCRIBERS.inc()
+        try:
+            cursor = last_event_id
+            while True:
+                if self.events:
+                    # Event ids are contiguous, so the replay offset is arithmetic
+                    oldest = self.events[0]["id"]
+                    backlog = list(islice(self.events, max(0, cursor - oldest + 1), None))
+                    for event in [e for e in self.pinned if cursor < e["id"] < oldest] + backlog:
+                        cursor = event["id"]
+                        yield event
+                if self.done and cursor >= self.last_event_id:
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.last_event_id > cursor or self.done)
+        finally:
+            self.subscribers -= 1
+            STREAM_SUBSCRIBERS.dec()
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "company": self.company,
+            "stage": self.stage,
+            "exit_type": self.exit_type,
+            "done": self.done,
+            "last_event_id": self.last_event_id,
+            "oldest_event_id": self.events[0]["id"] if self.events else 0,
+            "subscribers": self.subscribers,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+# _jobs holds every job (running, or finished within JOB_TTL) by id.
+# _in_flight maps the normalised (company, stage, exit_type) to the running
+# job, so concurrent identical requests attach instead of launching another
+# pipeline (single-flight).
+
+_jobs: Dict[str, Job] = {}
+_in_flight: Dict[Tuple, Job] = {}
+
+
+def job_key(company: str, stage: str, exit_type: str, bypass_llm_cache: bool = False) -> Tuple:
+    return (_normalize(company), _normalize(stage), _normalize(exit_type), bypass_llm_cache)
+
+
+def _evict_expired():
+    cutoff = time.time() - JOB_TTL
+    expired = [jid for jid, job in _jobs.items() if job.done and job.finished_at < cutoff]
+    for jid in expired:
+        del _jobs[jid]
+    if expired:
+        logger.info(f"Evicted {len(expired)} finished jobs")
+
+
+def get_or_start(company: str, stage: str, exit_type: str, bypass_llm_cache: bool = False) -> Tuple[Job, bool]:
+    """Return (job, joined) — joined is True when an in-flight run was reused."""
+    _evict_expired()
+    key = job_key(company, stage, exit_type, bypass_llm_cache)
+    job = _in_flight.get(key)
+    if job is not None and not job.done:
+        logger.info(f"Coalescing request for '{company}' onto in-flight job {job.id} ({job.subscribers} subscribers)")
+        return job, True
+
+    job = Job(key, company, stage, exit_type, bypass_llm_cache)
+    _jobs[job.id] = job
+    _in_flight[key] = job
+    job.start()
+    return job, False
+
+
+def get_job(job_id: str) -> Job | None:
+    _evict_expired()
+    return _jobs.get(job_id)
+
+
+def _finished(job: Job):
+    if _in_flight.get(job.key) is job:
+        del _in_flight[job.key]
+
+
+def in_flight_count() -> int:
+    return len(_in_flight)
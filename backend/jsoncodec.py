@@ -0,0 +1,26 @@
+import orjson
+
+# orjson-backed JSON for the hot paths: the asyncpg JSONB codec, SSE event
+# payloads and pre-encoded HTTP bodies. Output is compact UTF-8 (no ASCII
+# escaping); datetimes serialise as ISO 8601.
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, option=_OPTIONS)
+
+
+def dumps_str(obj) -> str:
+    return orjson.dumps(obj, option=_OPTIONS).decode()
+
+
+loads = orjson.loads
+
+
+# asyncpg binary JSONB wire format: a version byte (1) followed by the JSON text
+def encode_jsonb(obj) -> bytes:
+    return b"\x01" + orjson.dumps(obj, option=_OPTIONS)
+
+
+def decode_jsonb(data: bytes):
+    return orjson.loads(data[1:])
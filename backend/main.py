@@ -1,22 +1,24 @@
 import asyncio
-import json
 import logging
 import os
 import sys
 from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
 
 # Load .env before anything else so all child/reload processes see the vars
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).resolve().parent / ".env", override=True)
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 
 import database
+import http_client
+import jobs
 
 # ── Logging ───────────────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -32,6 +34,7 @@ class AnalyzeRequest(BaseModel):
     company: str
     stage: str = "Series A"        # Seed | Series A | Growth
     exit_type: str = ""            # IPO | Strategic Acquisition | ""
+    bypass_llm_cache: bool = False # force fresh extraction/analysis calls
 
 
 class SaveAnalysisRequest(BaseModel):
@@ -47,8 +50,18 @@ class PreferencesRequest(BaseModel):
 # ── Lifespan ───────────────────────────────────────────────────────────────────
 @asynccontextmanager
 async def lifespan(app):
+    from agents import corpus, graph, graph_memory
+    from config import GRAPH_ENGINE
     await database.init_pool()
+    await graph.init_driver()
+    if GRAPH_ENGINE == "memory":
+        await graph_memory.seed_from_history()
+    # Loading the tokenizer can fetch its BPE file — keep that off the event loop
+    await asyncio.to_thread(corpus.load_tokenizer)
     yield
+    await graph_memory.flush_mirror()
+    await graph.close_driver()
+    await http_client.close_clients()
     await database.close_pool()
 
 
@@ -67,6 +80,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -74,12 +88,20 @@ app.add_middleware(
 
 @app.get("/health")
 def health():
-    from config import OPENAI_API_KEY, TAVILY_API_KEY, NEO4J_ENABLED
+    from config import OPENAI_API_KEY, TAVILY_API_KEY, NEO4J_ENABLED, GRAPH_ENGINE
+    from agents import graph, graph_memory
+    from ratelimit import limiter_stats
     return {
         "status": "ok",
         "openai_configured": bool(OPENAI_API_KEY),
         "tavily_configured": bool(TAVILY_API_KEY),
         "neo4j_enabled": NEO4J_ENABLED,
+        "neo4j_connected": graph.driver is not None,
+        "neo4j_schema": graph.schema_state,
+        "graph_engine": GRAPH_ENGINE,
+        "graph_store": graph_memory.store.stats(),
+        "upstreams": limiter_stats(),
+        "preferences_cache": database.preferences_cache_state(),
     }
 
 
@@ -87,40 +109,71 @@ def health():
 async def analyze(req: AnalyzeRequest):
     """
     Starts the diligence pipeline and streams progress via Server-Sent Events.
-    The client should connect expecting 'text/event-stream'.
+    The client should connect expecting 'text/event-stream'. If the same
+    analysis is already running, the request attaches to it and receives the
+    events emitted so far followed by the live stream.
+
+    The pipeline runs as a background job that outlives this connection; the
+    first event carries its job_id for resuming via /jobs/{id}/events.
     """
     if not req.company.strip():
         raise HTTPException(status_code=400, detail="Company name is required")
 
-    from agents.orchestrator import OrchestratorAgent
-
-    async def event_generator():
-        orchestrator = OrchestratorAgent()
-        try:
-            async for event in orchestrator.run(
-                company=req.company.strip(),
-                stage=req.stage,
-                exit_type=req.exit_type,
-            ):
-                yield {
-                    "event": event["event"],
-                    "data": json.dumps(event["data"]),
-                }
-        except Exception as e:
-            logger.exception(f"Pipeline error for '{req.company}': {e}")
-            yield {
-                "event": "error",
-                "data": json.dumps({"message": str(e)}),
-            }
-
-    return EventSourceResponse(event_generator())
+    # Identical concurrent requests share one pipeline run (single-flight)
+    job, _ = jobs.get_or_start(
+        company=req.company.strip(),
+        stage=req.stage,
+        exit_type=req.exit_type,
+        bypass_llm_cache=req.bypass_llm_cache,
+    )
+
+    return EventSourceResponse(_job_stream(job), headers={"X-Job-Id": job.id})
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.summary()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    last_event_id: int = 0,
+    last_event_id_header: str = Header("", alias="Last-Event-ID"),
+):
+    """
+    Re-attach to a running or recently finished analysis. Events after
+    Last-Event-ID (header, or ?last_event_id= for fetch-based clients) are
+    replayed, then the live stream continues.
+    """
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+    return EventSourceResponse(_job_stream(job, last_event_id), headers={"X-Job-Id": job.id})
+
+
+async def _job_stream(job, last_event_id: int = 0):
+    async for event in job.subscribe(last_event_id):
+        yield {
+            "id": str(event["id"]),
+            "event": event["event"],
+            "data": event["encoded"],
+        }
 
 
 # ── Analysis history endpoints ─────────────────────────────────────────────────
 
 @app.post("/analyses")
 async def create_analysis(req: SaveAnalysisRequest):
-    saved = await database.save_analysis(req.company_name, req.sector, req.result)
+    # Token usage from the complete event gets its own column, not the result blob
+    result = dict(req.result)
+    usage = result.pop("usage", None)
+    saved = await database.save_analysis(req.company_name, req.sector, result, usage)
     if saved is None:
         # DB not configured — return a no-op 200 so the frontend doesn't error
         return {"id": None, "created_at": None}
@@ -128,16 +181,39 @@ async def create_analysis(req: SaveAnalysisRequest):
 
 
 @app.get("/analyses")
-async def list_analyses():
-    return await database.get_analyses()
+async def list_analyses(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = "",
+    company: str = "",
+    sector: str = "",
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """Newest-first history page; the next page's cursor is in X-Next-Cursor."""
+    try:
+        items, next_cursor = await database.get_analyses(
+            limit, cursor or None, company.strip() or None, sector.strip() or None, since, until,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse(items, headers=headers)
+
+
+@app.get("/analyses/search")
+async def search_analyses(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=50)):
+    """Full-text search over company, sector, acquirers, red flags and memo text."""
+    if database.pool and not database.search_available:
+        raise HTTPException(status_code=503, detail="Full-text search is unavailable")
+    return await database.search_analyses(q, limit)
 
 
 @app.get("/analyses/{id}")
 async def fetch_analysis(id: int):
-    entry = await database.get_analysis(id)
-    if entry is None:
+    body = await database.get_analysis_json(id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
-    return entry
+    return Response(body, media_type="application/json")
 
 
 @app.delete("/analyses/{id}")
@@ -161,6 +237,59 @@ async def save_preferences(req: PreferencesRequest):
     return {"ok": True}
 
 
+# ── Admin ─────────────────────────────────────────────────────────────────────
+
+def _require_admin(token: str):
+    from config import ADMIN_TOKEN
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus exposition: phase, upstream, Neo4j and pool-wait histograms plus in-flight gauges."""
+    import metrics
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/admin/limits")
+async def upstream_limits(x_admin_token: str = Header("")):
+    """Current concurrency window, queue depth and throttle counts per upstream."""
+    _require_admin(x_admin_token)
+    from ratelimit import limiter_stats
+    return limiter_stats()
+
+
+@app.get("/admin/search-cache")
+async def search_cache_stats(x_admin_token: str = Header("")):
+    _require_admin(x_admin_token)
+    from cache import search_cache
+    return search_cache.stats()
+
+
+@app.delete("/admin/search-cache")
+async def purge_search_cache(expired_only: bool = False, x_admin_token: str = Header("")):
+    """Purge the Tavily result cache (both tiers, or only expired Postgres rows)."""
+    _require_admin(x_admin_token)
+    from cache import search_cache
+    return await search_cache.purge(expired_only=expired_only)
+
+
+@app.get("/admin/llm-cache")
+async def llm_cache_stats(x_admin_token: str = Header("")):
+    _require_admin(x_admin_token)
+    from cache import llm_cache
+    return llm_cache.stats()
+
+
+@app.delete("/admin/llm-cache")
+async def purge_llm_cache(x_admin_token: str = Header("")):
+    _require_admin(x_admin_token)
+    from cache import llm_cache
+    return await llm_cache.purge()
+
+
 # ── Serve frontend (production) ──────────────────────────────────────────────
 # When the frontend has been built (e.g. on Render), serve it as static files.
 # This mount must stay LAST — it catches all unmatched paths.
@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from ratelimit import openai_limiter, tavily_limiter
+
+# Upstream calls span cached lookups (milliseconds) to long generations (a minute+)
+_UPSTREAM_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+_PHASE_BUCKETS = (0.01, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+PIPELINE_SECONDS = Histogram(
+    "dealscope_pipeline_seconds", "End-to-end pipeline run time",
+    ["outcome"], buckets=_PHASE_BUCKETS,
+)
+PHASE_SECONDS = Histogram(
+    "dealscope_phase_seconds", "Time spent in each pipeline task (DAG node or memo)",
+    ["phase"], buckets=_PHASE_BUCKETS,
+)
+TAVILY_SECONDS = Histogram(
+    "dealscope_tavily_query_seconds", "Tavily query latency, including cache lookups",
+    ["wave", "source", "outcome"], buckets=_UPSTREAM_BUCKETS,
+)
+OPENAI_SECONDS = Histogram(
+    "dealscope_openai_call_seconds", "OpenAI call latency, including limiter queueing and retries",
+    ["schema", "api", "outcome"], buckets=_UPSTREAM_BUCKETS,
+)
+NEO4J_SECONDS = Histogram(
+    "dealscope_neo4j_seconds", "Neo4j write transaction and analysis query latency",
+    ["operation", "outcome"], buckets=_DB_BUCKETS + (5, 10),
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "dealscope_db_pool_wait_seconds", "Time waiting to acquire an asyncpg pool connection",
+    buckets=_DB_BUCKETS,
+)
+OPENAI_TOKENS = Counter(
+    "dealscope_openai_tokens", "OpenAI tokens billed, by schema and kind (input / output / cached)",
+    ["schema", "kind"],
+)
+
+PIPELINES_IN_FLIGHT = Gauge("dealscope_pipelines_in_flight", "Pipeline runs currently executing")
+STREAM_SUBSCRIBERS = Gauge("dealscope_stream_subscribers", "SSE clients attached to a job stream")
+UPSTREAM_IN_FLIGHT = Gauge("dealscope_upstream_in_flight", "Requests admitted by each upstream limiter", ["upstream"])
+UPSTREAM_QUEUED = Gauge("dealscope_upstream_queued", "Requests waiting on each upstream limiter", ["upstream"])
+UPSTREAM_WINDOW = Gauge("dealscope_upstream_window", "Current adaptive concurrency window", ["upstream"])
+
+for _name, _limiter in (("tavily", tavily_limiter), ("openai", openai_limiter)):
+    UPSTREAM_IN_FLIGHT.labels(_name).set_function(lambda l=_limiter: l.in_flight)
+    UPSTREAM_QUEUED.labels(_name).set_function(lambda l=_limiter: l.waiting)
+    UPSTREAM_WINDOW.labels(_name).set_function(lambda l=_limiter: l.window)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the block's duration, labelled outcome=ok / error / cancelled."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield labels
+    except Exception:
+        outcome = "error"
+        raise
+    except BaseException:
+        outcome = "cancelled"
+        raise
+    finally:
+        histogram.labels(outcome=outcome, **labels).observe(time.perf_counter() - start)
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+from config import (
+    TAVILY_RATE,
+    TAVILY_BURST,
+    TAVILY_MAX_CONCURRENCY,
+    OPENAI_RATE,
+    OPENAI_BURST,
+    OPENAI_MAX_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after_seconds(headers, default: float = 1.0) -> float:
+    """Parse Retry-After (seconds or HTTP date) / retry-after-ms, falling back to `default`."""
+    if headers is None:
+        return default
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(float(ms) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except Exception:
+                pass
+    return default
+
+
+class AdaptiveLimiter:
+    """
+    Process-wide admission control for one upstream API.
+
+    Two gates apply to every request: a token bucket caps the request rate,
+    and an AIMD window caps concurrency — each success widens the window by
+    roughly one slot per window's worth of requests, each throttle response
+    halves it and pauses admissions for the server's Retry-After. Callers
+    that can't be admitted queue rather than fail. A rate of 0 or less turns
+    the token bucket off and leaves only the concurrency window.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.window = float(max_concurrency)
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.completed = 0
+        self._refilled_at = time.monotonic()
+        self._cond: asyncio.Condition | None = None
+        self._loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Bound lazily so the limiter works across event loops (tests, benchmarks)
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+        return self._cond
+
+    def _refill(self, now: float):
+        if self.rate <= 0:
+            self.tokens = float(self.burst)
+            self._refilled_at = now
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    async def acquire(self):
+        cond = self._condition()
+        self.waiting += 1
+        try:
+            async with cond:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self.paused_until:
+                        timeout = self.paused_until - now
+                    elif self.in_flight >= int(self.window):
+                        timeout = None           # woken by release()
+                    elif self.rate > 0 and self.tokens < 1:
+                        timeout = (1 - self.tokens) / self.rate
+                    else:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        return
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.waiting -= 1
+
+    async def release(self):
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def on_success(self):
+        self.completed += 1
+        if self.window < self.max_concurrency:
+            self.window = min(self.max_concurrency, self.window + 1 / self.window)
+
+    def on_throttle(self, retry_after: float):
+        self.throttled += 1
+        now = time.monotonic()
+        # Requests already in flight when the first 429 landed come back
+        # throttled too — halve once per pause, not once per response
+        if now >= self.paused_until:
+            self.window = max(self.min_concurrency, self.window / 2)
+        self.paused_until = max(self.paused_until, now + retry_after)
+        logger.warning(
+            f"{self.name} throttled — window now {int(self.window)}, "
+            f"pausing {retry_after:.1f}s, {self.waiting} queued"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "window": round(self.window, 2),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "tokens": round(self.tokens, 2),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "throttled": self.throttled,
+            "completed": self.completed,
+        }
+
+
+tavily_limiter = AdaptiveLimiter("tavily", TAVILY_RATE, TAVILY_BURST, TAVILY_MAX_CONCURRENCY)
+openai_limiter = AdaptiveLimiter("openai", OPENAI_RATE, OPENAI_BURST, OPENAI_MAX_CONCURRENCY)
+
+
+def limiter_stats() -> dict:
+    return {"tavily": tavily_limiter.stats(), "openai": openai_limiter.stats()}
@@ -49,3 +49,4 @@ class GraphInsights(BaseModel):
     competitive_density: dict = Field(default_factory=dict)
     graph_stats: dict = Field(default_factory=dict)
     neo4j_available: bool = False
+    engine: str = ""                   # memory | neo4j | "" when no graph was built
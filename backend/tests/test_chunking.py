@@ -0,0 +1,85 @@
+from agents.corpus import SEPARATOR, count_tokens, split_corpus
+from agents.extraction import CORE_KEYS, MARKET_KEYS, merge_entities
+from schemas.core import (
+    Acquisition,
+    CompanyInfo,
+    Competitor,
+    CoreEntities,
+    Investor,
+    MarketEntities,
+)
+
+
+def _corpus(*blocks: str) -> str:
+    return SEPARATOR.join(blocks)
+
+
+def test_split_corpus_returns_text_when_it_fits():
+    text = _corpus("alpha beta", "gamma delta")
+    assert split_corpus(text, 10_000) == [text]
+
+
+def test_split_corpus_keeps_sources_whole_and_in_order():
+    blocks = [f"source {i} " + "word " * 200 for i in range(6)]
+    text = _corpus(*blocks)
+    limit = count_tokens(text) // 3 + 50
+
+    chunks = split_corpus(text, limit)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(c) <= limit for c in chunks)
+    rejoined = [b for c in chunks for b in c.split(SEPARATOR)]
+    assert rejoined == blocks
+
+
+def test_split_corpus_gives_an_oversized_source_its_own_chunk():
+    big = "huge " * 2000
+    text = _corpus("small one", big, "small two")
+
+    chunks = split_corpus(text, count_tokens(big) // 2)
+
+    assert big in chunks
+    assert [b for c in chunks for b in c.split(SEPARATOR)] == ["small one", big, "small two"]
+
+
+def test_merge_entities_unions_on_identity_and_fills_empty_fields():
+    first = CoreEntities(
+        company=CompanyInfo(name="Acme", sector=""),
+        investors=[Investor(name="Sequoia Capital")],
+        competitors=[Competitor(name="Globex", overlap_type="adjacent")],
+    )
+    second = CoreEntities(
+        company=CompanyInfo(name="Acme Inc", sector="Fintech", key_products=["Pay"]),
+        investors=[Investor(name="sequoia capital", type="VC", is_lead=True), Investor(name="Accel")],
+        competitors=[Competitor(name="Globex", overlap_type="direct", differentiator="cheaper")],
+    )
+
+    merged = merge_entities([first, second], CORE_KEYS)
+
+    # First non-empty scalar wins; empty ones are filled from later chunks
+    assert merged.company.name == "Acme"
+    assert merged.company.sector == "Fintech"
+    assert merged.company.key_products == ["Pay"]
+    assert [i.name for i in merged.investors] == ["Sequoia Capital", "Accel"]
+    # "Unknown" is a real value, not an empty one, so it is kept
+    assert merged.investors[0].type == "Unknown"
+    # A lead flag from any chunk survives the merge
+    assert merged.investors[0].is_lead
+    (globex,) = merged.competitors
+    assert globex.overlap_type == "adjacent"
+    assert globex.differentiator == "cheaper"
+
+
+def test_merge_entities_matches_acquisitions_missing_a_year():
+    first = MarketEntities(acquisitions=[Acquisition(target="Foo", acquirer="Bar", year=None)])
+    second = MarketEntities(acquisitions=[
+        Acquisition(target="foo", acquirer="bar", year=2023, deal_size="$1B"),
+        Acquisition(target="Baz", acquirer="Bar", year=2021),
+    ])
+
+    merged = merge_entities([first, second], MARKET_KEYS)
+
+    assert [(a.target, a.year, a.deal_size) for a in merged.acquisitions] == [
+        ("Foo", 2023, "$1B"),
+        ("Baz", 2021, ""),
+    ]
@@ -0,0 +1,52 @@
+from agents.corpus import SEPARATOR, build_corpus, count_tokens
+
+
+def _result(url: str, content: str, title: str = "", score: float = 0.0) -> dict:
+    return {"url": url, "title": title, "content": content, "score": score}
+
+
+def _words(prefix: str, n: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_repeated_urls_and_empty_content_are_dropped():
+    corpus = build_corpus([
+        _result("https://a", "alpha"),
+        _result("https://a", "alpha again"),
+        _result("https://b", ""),
+    ], "core")
+    assert corpus.count("[Source") == 1
+    assert "alpha again" not in corpus
+
+
+def test_near_duplicates_keep_the_more_relevant_copy():
+    text = _words("shared", 200)
+    corpus = build_corpus([
+        _result("https://syndicated", text),
+        _result("https://original", text + " acme", title="Acme raises funding"),
+    ], "core", focus=["Acme"])
+    assert corpus.count("[Source") == 1
+    assert "https://original" in corpus
+
+
+def test_sources_are_ranked_by_focus_and_intent():
+    corpus = build_corpus([
+        _result("https://weather", "sunny skies today"),
+        _result("https://acme", "acme founders raised a series b from investors"),
+    ], "core", focus=["Acme"])
+    assert corpus.index("https://acme") < corpus.index("https://weather")
+
+
+def test_corpus_stays_within_budget_and_truncates_the_last_source():
+    results = [_result(f"https://s{i}", _words(f"s{i}w", 400)) for i in range(5)]
+    corpus = build_corpus(results, "core", budget=1000)
+    assert count_tokens(corpus) <= 1000
+    # The source that didn't fit whole is cut into the remaining space
+    blocks = corpus.split(SEPARATOR)
+    assert len(blocks) > 1
+    assert count_tokens(blocks[-1]) < count_tokens(blocks[0])
+
+
+def test_same_results_produce_the_same_corpus():
+    results = [_result(f"https://s{i}", _words(f"s{i}w", 50), score=0.5) for i in range(6)]
+    assert build_corpus(results, "market") == build_corpus(list(results), "market")
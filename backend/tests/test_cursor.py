@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips():
+    created_at = datetime(2025, 3, 4, 5, 6, 7, 891011, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_cursor_keeps_non_utc_offsets():
+    created_at = datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=-5)))
+    decoded, _ = decode_cursor(encode_cursor(created_at, 1))
+    assert decoded == created_at and decoded.utcoffset() == timedelta(hours=-5)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2025, 1, 1, tzinfo=timezone.utc), 10**9)
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm9waXBl", encode_cursor(datetime(2025, 1, 1), 1)[:-4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match="invalid cursor"):
+        decode_cursor(cursor)
@@ -0,0 +1,74 @@
+from agents.graph_memory import GraphStore
+from schemas.core import (
+    Acquisition,
+    CompanyInfo,
+    Competitor,
+    CompetitorDetail,
+    CoreEntities,
+    Investor,
+    MarketEntities,
+    MarketInfo,
+    SignalEntities,
+)
+
+
+def _run(store: GraphStore, name: str, market: str = "Payments", **core):
+    store.add_entities(
+        CoreEntities(company=CompanyInfo(name=name), **core),
+        MarketEntities(market=MarketInfo(name=market)),
+        SignalEntities(),
+    )
+
+
+def test_investor_overlap_and_top_acquirers():
+    store = GraphStore()
+    store.add_saved_result("Stripe", {
+        "market_info": {"name": "Payments"},
+        "comps_table": [{"target": "Braintree", "acquirer": "PayPal"}],
+    })
+    store.add_entities(
+        CoreEntities(
+            company=CompanyInfo(name="Acme"),
+            investors=[Investor(name="Sequoia")],
+            competitors=[Competitor(name="Globex")],
+        ),
+        MarketEntities(
+            market=MarketInfo(name="Payments"),
+            acquisitions=[Acquisition(target="Venmo", acquirer="PayPal")],
+            competitor_details=[CompetitorDetail(name="Globex", key_investors=["Sequoia"])],
+        ),
+        SignalEntities(),
+    )
+
+    insights = store.analyze("Acme")
+
+    assert insights.engine == "memory"
+    assert insights.investor_overlaps == [{"investor": "Sequoia", "also_backs": ["Globex"]}]
+    assert insights.top_acquirers == [
+        {"acquirer": "PayPal", "deal_count": 2, "targets_acquired": ["Braintree", "Venmo"]},
+    ]
+    assert insights.competitive_density == {"competitor_count": 1}
+
+
+def test_rerunning_a_company_does_not_duplicate_nodes():
+    store = GraphStore()
+    _run(store, "Acme", investors=[Investor(name="Sequoia")])
+    before = store.stats()
+    _run(store, "Acme", investors=[Investor(name="Sequoia")])
+    assert store.stats() == before
+
+
+def test_least_recently_used_companies_are_evicted_past_the_cap():
+    store = GraphStore(max_companies=10)
+    for i in range(10):
+        _run(store, f"Co{i}", market=f"M{i}")
+    store.analyze("Co0")  # a read counts as a use
+
+    _run(store, "Co10", market="M10")
+
+    stats = store.stats()
+    assert stats["companies"] == 9 and stats["evicted"] == 2
+    assert store.find("Company", "Co0") is not None
+    assert store.find("Company", "Co1") is None and store.find("Company", "Co2") is None
+    assert store.find("Market", "M1") is None
+    assert store.find("Company", "Co10") is not None
@@ -0,0 +1,147 @@
+import asyncio
+import re
+
+from agents import graph
+from agents.graph import GraphAgent
+from schemas.core import (
+    Acquisition,
+    CompanyInfo,
+    Competitor,
+    CompetitorDetail,
+    CoreEntities,
+    Founder,
+    Funding,
+    Investor,
+    MarketEntities,
+    MarketInfo,
+    Partnership,
+    SignalEntities,
+)
+
+
+def _entities():
+    core = CoreEntities(
+        company=CompanyInfo(name="Acme", sector="Fintech", founded_year=2019, hq_location="NYC"),
+        founders=[
+            Founder(name="Ada", role="CEO", prior_companies=["Globex", ""]),
+            Founder(name="Bob", role="CTO"),
+        ],
+        investors=[Investor(name="Sequoia", type="VC", is_lead=True), Investor(name="Angel Al")],
+        funding=Funding(total_raised="$20M"),
+        competitors=[Competitor(name="Initech", overlap_type="adjacent", estimated_funding="$5M")],
+    )
+    market = MarketEntities(
+        market=MarketInfo(name="Payments", tam="$1T", growth_rate="12%"),
+        acquisitions=[
+            Acquisition(target="Foo", acquirer="Bar", year=2023, deal_size="$1B"),
+            Acquisition(target="", acquirer="Bar"),
+        ],
+        competitor_details=[CompetitorDetail(name="Initech", key_investors=["Accel", ""])],
+    )
+    signals = SignalEntities(partnerships=[Partnership(partner="Visa", type="distribution"), Partnership(partner="")])
+    return core, market, signals
+
+
+def test_one_batch_per_entity_class_in_write_order():
+    batches = GraphAgent._write_batches(*_entities())
+    assert [(name, query) for name, query, _ in batches] == [
+        ("company", graph._WRITE_COMPANY),
+        ("market", graph._WRITE_MARKET),
+        ("founders", graph._WRITE_FOUNDERS),
+        ("investors", graph._WRITE_INVESTORS),
+        ("competitors", graph._WRITE_COMPETITORS),
+        ("competitor_investors", graph._WRITE_COMPETITOR_INVESTORS),
+        ("acquisitions", graph._WRITE_ACQUISITIONS),
+        ("partnerships", graph._WRITE_PARTNERSHIPS),
+    ]
+
+
+def test_rows_are_grouped_and_blank_entities_dropped():
+    params = {name: p for name, _, p in GraphAgent._write_batches(*_entities())}
+
+    assert params["company"] == {"row": {
+        "sector": "Fintech", "sub_sector": "", "founded_year": 2019, "hq": "NYC",
+        "description": "", "total_funding": "$20M", "estimated_revenue": "",
+    }}
+    assert params["market"] == {"row": {"tam": "$1T", "growth_rate": "12%"}}
+    assert params["founders"]["rows"] == [
+        {"name": "Ada", "role": "CEO", "background": "", "prior_companies": ["Globex"]},
+        {"name": "Bob", "role": "CTO", "background": "", "prior_companies": []},
+    ]
+    assert params["investors"]["rows"] == [
+        {"name": "Sequoia", "type": "VC", "is_lead": True},
+        {"name": "Angel Al", "type": "Unknown", "is_lead": False},
+    ]
+    assert params["competitors"]["rows"] == [{"name": "Initech", "estimated_funding": "$5M", "overlap": "adjacent"}]
+    assert params["competitor_investors"]["rows"] == [{"investor": "Accel", "company": "Initech"}]
+    assert params["acquisitions"]["rows"] == [
+        {"target": "Foo", "acquirer": "Bar", "year": 2023, "deal_size": "$1B", "implied_multiple": ""},
+    ]
+    assert params["partnerships"]["rows"] == [{"partner": "Visa", "type": "distribution"}]
+
+
+def test_parameters_match_what_each_statement_reads():
+    for name, query, params in GraphAgent._write_batches(*_entities()):
+        if "UNWIND $rows" in query:
+            read = set(re.findall(r"\brow\.(\w+)", query))
+            assert all(set(row) == read for row in params["rows"]), name
+        else:
+            assert set(params["row"]) == set(re.findall(r"\$row\.(\w+)", query)), name
+
+
+def test_empty_entity_classes_are_skipped():
+    core = CoreEntities(company=CompanyInfo(name="Acme"))
+    batches = GraphAgent._write_batches(core, MarketEntities(), SignalEntities())
+    assert [name for name, _, _ in batches] == ["company"]
+
+
+class _Tx:
+    def __init__(self):
+        self.runs = []
+
+    async def run(self, query, **params):
+        self.runs.append((query, params))
+        return self
+
+    async def consume(self):
+        pass
+
+
+class _Session:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute_write(self, work):
+        tx = _Tx()
+        self.log.append(tx)
+        return await work(tx)
+
+
+class _Driver:
+    def __init__(self):
+        self.transactions = []
+
+    def session(self):
+        return _Session(self.transactions)
+
+
+def test_build_graph_writes_every_batch_in_one_transaction():
+    agent = GraphAgent()
+    agent.driver = _Driver()
+    core, market, signals = _entities()
+
+    asyncio.run(agent.build_graph(core, market, signals))
+
+    (tx,) = agent.driver.transactions
+    assert len(tx.runs) == len(GraphAgent._write_batches(core, market, signals))
+    assert all(p["company_name"] == "Acme" and p["market_name"] == "Payments" for _, p in tx.runs)
+    assert set(agent.write_timings) == {
+        "company", "market", "founders", "investors", "competitors",
+        "competitor_investors", "acquisitions", "partnerships", "total",
+    }
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+import jobs
+from jobs import Job, get_or_start, job_key
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Never launch the real pipeline; tests drive _publish directly
+    monkeypatch.setattr(Job, "start", lambda self: None)
+    monkeypatch.setattr(jobs, "_jobs", {})
+    monkeypatch.setattr(jobs, "_in_flight", {})
+
+
+def test_job_key_normalises_case_and_whitespace():
+    assert job_key("  Acme   Corp ", "Series A", "IPO") == job_key("acme corp", "series  a", "ipo")
+    assert job_key("Acme", "Seed", "") != job_key("Acme", "Seed", "", bypass_llm_cache=True)
+
+
+def test_identical_requests_share_one_in_flight_job():
+    first, joined_first = get_or_start("Acme", "Seed", "")
+    second, joined_second = get_or_start(" acme ", "SEED", "")
+    assert (joined_first, joined_second) == (False, True)
+    assert second is first
+    assert jobs.in_flight_count() == 1
+
+
+def test_finished_job_is_not_joined():
+    first, _ = get_or_start("Acme", "Seed", "")
+    first.done, first.finished_at = True, time.time()
+    jobs._finished(first)
+    second, joined = get_or_start("Acme", "Seed", "")
+    assert not joined and second is not first
+
+
+def _job(log_size: int) -> Job:
+    job = Job(job_key("Acme", "Seed", ""), "Acme", "Seed", "", False)
+    job.events = jobs.deque(maxlen=log_size)
+    return job
+
+
+async def _drain(job: Job, last_event_id: int = 0) -> list:
+    return [(e["id"], e["event"]) async for e in job.subscribe(last_event_id)]
+
+
+async def _finish(job: Job):
+    job.done = True
+    async with job._changed:
+        job._changed.notify_all()
+
+
+def test_replay_resumes_after_last_event_id():
+    async def main():
+        job = _job(log_size=100)
+        for i in range(5):
+            await job._publish({"event": "status", "data": {"i": i}})
+        await _finish(job)
+        return await _drain(job, last_event_id=3)
+
+    assert asyncio.run(main()) == [(4, "status"), (5, "status")]
+
+
+def test_live_subscriber_follows_new_events():
+    async def main():
+        job = _job(log_size=100)
+        received = asyncio.create_task(_drain(job))
+        await asyncio.sleep(0)
+        await job._publish({"event": "status", "data": {}})
+        await job._publish({"event": "complete", "data": {}})
+        await _finish(job)
+        return await asyncio.wait_for(received, 1)
+
+    assert asyncio.run(main()) == [(1, "status"), (2, "complete")]
+
+
+def test_replay_keeps_pinned_events_pushed_out_of_the_log():
+    async def main():
+        job = _job(log_size=3)
+        await job._publish({"event": "job", "data": {"job_id": job.id}})
+        await job._publish({"event": "entities_ready", "data": {}})
+        for i in range(6):
+            await job._publish({"event": "memo_delta", "data": {"delta": str(i)}})
+        await job._publish({"event": "complete", "data": {}})
+        await _finish(job)
+        return await _drain(job), await _drain(job, last_event_id=1)
+
+    full, resumed = asyncio.run(main())
+    assert full == [(1, "job"), (2, "entities_ready"), (7, "memo_delta"), (8, "memo_delta"), (9, "complete")]
+    assert resumed == full[1:]
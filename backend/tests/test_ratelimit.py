@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from ratelimit import AdaptiveLimiter, retry_after_seconds
+
+
+def _limiter(**kwargs) -> AdaptiveLimiter:
+    return AdaptiveLimiter("test", **{"rate": 1000.0, "burst": 1000, "max_concurrency": 8, **kwargs})
+
+
+def test_throttle_halves_window_down_to_the_floor():
+    limiter = _limiter(min_concurrency=2)
+    limiter.on_throttle(0)
+    assert limiter.window == 4
+    limiter.on_throttle(0)
+    limiter.on_throttle(0)
+    assert limiter.window == 2
+    assert limiter.throttled == 3
+
+
+def test_burst_of_throttles_halves_window_once_per_pause():
+    limiter = _limiter()
+    for _ in range(5):
+        limiter.on_throttle(1.0)
+    assert limiter.window == 4
+    assert limiter.throttled == 5
+    # A throttle after the pause has lapsed starts a new epoch
+    limiter.paused_until = time.monotonic()
+    limiter.on_throttle(1.0)
+    assert limiter.window == 2
+
+
+def test_success_grows_window_additively_up_to_the_cap():
+    limiter = _limiter()
+    limiter.on_throttle(0)
+    limiter.on_throttle(0)
+    assert limiter.window == 2
+    # Roughly one slot per window's worth of successes
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.window == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.window == 8
+
+
+def test_window_caps_concurrency():
+    limiter = _limiter(max_concurrency=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+def test_throttle_pauses_admission():
+    limiter = _limiter()
+
+    async def main():
+        limiter.on_throttle(0.1)
+        start = time.monotonic()
+        async with limiter.slot():
+            return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_token_bucket_paces_past_the_burst():
+    limiter = _limiter(rate=50.0, burst=1)
+
+    async def main():
+        start = time.monotonic()
+        for _ in range(3):
+            async with limiter.slot():
+                pass
+        return time.monotonic() - start
+
+    # The first call spends the burst; the next two wait ~20ms each for tokens
+    assert asyncio.run(main()) >= 0.035
+
+
+def test_non_positive_rate_disables_the_token_bucket():
+    limiter = _limiter(rate=0.0, burst=1)
+
+    async def main():
+        for _ in range(5):
+            async with limiter.slot():
+                pass
+
+    asyncio.run(asyncio.wait_for(main(), 1))
+    assert limiter.in_flight == 0
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_seconds({"retry-after": "3"}) == 3.0
+    assert retry_after_seconds({"retry-after": "soon"}, default=7.0) == 7.0
+    assert retry_after_seconds(None, default=2.0) == 2.0
+    assert retry_after_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
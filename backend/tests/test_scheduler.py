@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from agents.scheduler import Task, TaskGraph
+
+
+async def _value(v):
+    return v
+
+
+def test_order_puts_dependencies_first():
+    graph = TaskGraph([
+        Task("c", _value, ["a", "b"]),
+        Task("b", _value, ["a"]),
+        Task("a", lambda: _value(1)),
+    ])
+    assert graph.order == ["a", "b", "c"]
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError, match="Cycle"):
+        TaskGraph([Task("a", _value, ["b"]), Task("b", _value, ["a"])])
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="unknown task 'missing'"):
+        TaskGraph([Task("a", _value, ["missing"])])
+
+
+def test_duplicate_task_is_rejected():
+    with pytest.raises(ValueError, match="Duplicate"):
+        TaskGraph([Task("a", lambda: _value(1)), Task("a", lambda: _value(2))])
+
+
+def test_results_flow_along_edges_and_branches_overlap():
+    started = []
+
+    async def slow():
+        started.append("slow")
+        await asyncio.sleep(0.05)
+        return 2
+
+    async def fast():
+        started.append("fast")
+        return 3
+
+    async def add(x, y):
+        return x + y
+
+    async def main():
+        graph = TaskGraph([
+            Task("slow", slow),
+            Task("fast", fast),
+            Task("sum", add, ["slow", "fast"]),
+        ]).start()
+        try:
+            return await graph.result("sum"), graph.timings
+        finally:
+            await graph.cancel()
+
+    total, timings = asyncio.run(main())
+    assert total == 5
+    assert sorted(started) == ["fast", "slow"]
+    assert set(timings) == {"slow", "fast", "sum"}
+
+
+def test_cancel_stops_pending_tasks():
+    async def never():
+        await asyncio.sleep(60)
+
+    async def main():
+        graph = TaskGraph([Task("never", never)]).start()
+        await asyncio.sleep(0)
+        await graph.cancel()
+        return graph._running["never"]
+
+    assert asyncio.run(main()).cancelled()
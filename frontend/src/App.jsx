@@ -75,23 +75,32 @@ export default function App() {
   const [activeTab, setActiveTab] = useState('memo')
   const [query, setQuery] = useState(null)
   const [history, setHistory] = useState([])
+  const [historyCursor, setHistoryCursor] = useState(null)
   const savedRef = useRef(false)
-  const { run, steps, result, error, isRunning, abort, reset } = useSSE()
+  const { run, steps, result, partial, memoDraft, error, isRunning, abort, reset } = useSSE()
 
   // Restored result from history (bypasses useSSE)
   const [restoredResult, setRestoredResult] = useState(null)
-  const displayResult = restoredResult || result
+  const finalResult = restoredResult || result
+  // While running, tabs render from the partial results streamed so far
+  const displayResult = finalResult || partial
 
   const [showHistory, setShowHistory] = useState(false)
   const [preferences, setPreferences] = useState('')
   const [toast, setToast] = useState(null)
   const toastTimerRef = useRef(null)
 
+  async function fetchHistoryPage(cursor) {
+    const r = await fetch(cursor ? `/analyses?cursor=${encodeURIComponent(cursor)}` : '/analyses')
+    if (!r.ok) return
+    const data = await r.json()
+    if (!Array.isArray(data)) return
+    setHistory(prev => cursor ? [...prev, ...data] : data)
+    setHistoryCursor(r.headers.get('X-Next-Cursor'))
+  }
+
   useEffect(() => {
-    fetch('/analyses')
-      .then(r => r.ok ? r.json() : [])
-      .then(data => setHistory(Array.isArray(data) ? data : []))
-      .catch(() => {})
+    fetchHistoryPage(null).catch(() => {})
     fetch('/preferences')
       .then(r => r.ok ? r.json() : {})
       .then(data => setPreferences(data.memo_preferences || ''))
@@ -178,7 +187,7 @@ export default function App() {
     serverPassword: import.meta.env.VITE_NEO4J_PASSWORD || '',
   }
 
-  // Badge counts shown on tab pills — only populated once the pipeline completes
+  // Badge counts shown on tab pills — populated as soon as analysis results arrive
   const badgeCounts = {
     comps:     displayResult?.comps_table?.length     || 0,
     risks:     displayResult?.red_flags?.length        || 0,
@@ -231,11 +240,11 @@ export default function App() {
             </button>
           )}
 
-          {displayResult && (
+          {finalResult && (
             <div className="ml-auto flex items-center gap-2">
               <div className="w-1.5 h-1.5 rounded-full bg-emerald-500" />
               <span className="text-xs text-gray-500 tabular-nums">
-                {displayResult.total_elapsed ? `${displayResult.total_elapsed}s` : 'Complete'}
+                {finalResult.total_elapsed ? `${finalResult.total_elapsed}s` : 'Complete'}
               </span>
             </div>
           )}
@@ -323,7 +332,7 @@ export default function App() {
             <div className="p-5">
               {activeTab === 'memo' && (
                 <MemoView
-                  memo={displayResult?.memo}
+                  memo={displayResult?.memo || memoDraft}
                   companyName={displayResult?.company_info?.name || query?.company || ''}
                 />
               )}
@@ -362,6 +371,7 @@ export default function App() {
             history={history}
             onLoad={handleLoadHistory}
             onDelete={handleDeleteHistory}
+            onLoadMore={historyCursor ? () => fetchHistoryPage(historyCursor).catch(() => {}) : null}
           />
         )}
 
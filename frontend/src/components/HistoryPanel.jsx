@@ -51,7 +51,7 @@ function DownloadButton({ entry }) {
   )
 }
 
-export default function HistoryPanel({ history, onLoad, onDelete }) {
+export default function HistoryPanel({ history, onLoad, onDelete, onLoadMore }) {
   if (!history || history.length === 0) return null
 
   return (
@@ -108,6 +108,15 @@ export default function HistoryPanel({ history, onLoad, onDelete }) {
           </div>
         ))}
       </div>
+
+      {onLoadMore && (
+        <button
+          onClick={onLoadMore}
+          className="w-full text-xs font-medium py-2 rounded-lg border border-gray-800 text-gray-500 hover:text-gray-300 hover:border-gray-700 transition-colors"
+        >
+          Load more
+        </button>
+      )}
     </div>
   )
 }
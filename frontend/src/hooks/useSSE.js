@@ -1,8 +1,13 @@
 import { useState, useCallback, useRef } from 'react'
 
+// Reconnect attempts after a dropped stream before giving up on a job
+const MAX_RECONNECTS = 5
+
 export function useSSE() {
   const [steps, setSteps]       = useState([])
   const [result, setResult]     = useState(null)
+  const [partial, setPartial]   = useState(null)
+  const [memoDraft, setMemoDraft] = useState('')
   const [error, setError]       = useState(null)
   const [isRunning, setIsRunning] = useState(false)
   const [debugLog, setDebugLog] = useState([])
@@ -16,6 +21,8 @@ export function useSSE() {
   const run = useCallback(async ({ company, stage, exit_type }) => {
     setSteps([])
     setResult(null)
+    setPartial(null)
+    setMemoDraft('')
     setError(null)
     setDebugLog([])
     setIsRunning(true)
@@ -26,15 +33,59 @@ export function useSSE() {
 
     addLog(`Starting analysis for "${company}"`)
 
+    // Resume state — the first event carries the job id, and every event an id
+    let jobId = null
+    let lastEventId = 0
+    let finished = false
+    // Structured results arrive piecemeal (*_ready events) ahead of the memo
+    let merged = {}
+
     try {
       addLog('Sending POST /analyze...')
-      const response = await fetch('/analyze', {
+      let response = await fetch('/analyze', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
         body: JSON.stringify({ company, stage, exit_type }),
         signal: controller.signal,
       })
 
+      // The pipeline keeps running server-side if the connection drops, so
+      // re-attach to the job and replay from the last event we saw.
+      for (let attempt = 0; ; attempt++) {
+        try {
+          if (attempt > 0) {
+            addLog(`Reconnecting to job ${jobId} after event ${lastEventId}...`)
+            response = await fetch(`/jobs/${jobId}/events`, {
+              headers: { 'Accept': 'text/event-stream', 'Last-Event-ID': String(lastEventId) },
+              signal: controller.signal,
+            })
+          }
+          await readStream(response)
+        } catch (streamErr) {
+          if (streamErr.name === 'AbortError' || !jobId) throw streamErr
+          addLog(`Stream interrupted: ${streamErr.message}`)
+        }
+        if (finished || !jobId || attempt >= MAX_RECONNECTS) break
+        await new Promise(r => setTimeout(r, 1000 * (attempt + 1)))
+      }
+
+      if (!finished) {
+        throw new Error('Connection lost before the analysis finished')
+      }
+
+    } catch (err) {
+      if (err.name === 'AbortError') {
+        addLog('Aborted by user')
+      } else {
+        addLog(`FETCH ERROR: ${err.name}: ${err.message}`)
+        setError(err.message)
+      }
+    } finally {
+      addLog('Done')
+      setIsRunning(false)
+    }
+
+    async function readStream(response) {
       addLog(`Response: ${response.status} ${response.statusText}, type=${response.type}`)
 
       if (!response.ok) {
@@ -51,6 +102,7 @@ export function useSSE() {
       let buffer = ''
       let currentEvent = null
       let currentData = null
+      let currentId = null
       let chunkCount = 0
 
       addLog('Stream open, reading chunks...')
@@ -71,12 +123,15 @@ export function useSSE() {
         buffer = lines.pop()
 
         for (const line of lines) {
-          if (line.startsWith('event: ')) {
+          if (line.startsWith('id: ')) {
+            currentId = parseInt(line.slice(4).trim(), 10)
+          } else if (line.startsWith('event: ')) {
             currentEvent = line.slice(7).trim()
           } else if (line.startsWith('data: ')) {
             currentData = line.slice(6).trim()
           } else if (line.trim() === '' && currentEvent && currentData) {
             addLog(`Event: "${currentEvent}" data=${currentData.slice(0, 60)}`)
+            if (currentId) lastEventId = currentId
             try {
               const parsed = JSON.parse(currentData)
               handleEvent(currentEvent, parsed)
@@ -85,24 +140,16 @@ export function useSSE() {
             }
             currentEvent = null
             currentData = null
+            currentId = null
           }
         }
       }
-
-    } catch (err) {
-      if (err.name === 'AbortError') {
-        addLog('Aborted by user')
-      } else {
-        addLog(`FETCH ERROR: ${err.name}: ${err.message}`)
-        setError(err.message)
-      }
-    } finally {
-      addLog('Done')
-      setIsRunning(false)
     }
 
     function handleEvent(eventType, data) {
-      if (eventType === 'status') {
+      if (eventType === 'job') {
+        jobId = data.job_id
+      } else if (eventType === 'status') {
         setSteps(prev => {
           const idx = prev.findIndex(s => s.step === data.step && !s.done)
           if (idx >= 0) {
@@ -112,14 +159,23 @@ export function useSSE() {
           }
           return [...prev, { ...data, done: data.icon === 'check' }]
         })
+      } else if (eventType === 'entities_ready' || eventType === 'market_ready' || eventType === 'analysis_ready') {
+        merged = { ...merged, ...data }
+        setPartial(merged)
       } else if (eventType === 'graph_ready') {
+        merged = { ...merged, graph_stats: data.graph_stats, investor_overlaps: data.investor_overlaps }
+        setPartial(merged)
         setSteps(prev => [...prev, {
-          message: `Relationship graph ${data.neo4j_available ? 'built in Neo4j' : 'ready (local mode)'}`,
+          message: `Relationship graph ${data.engine === 'memory' ? 'built in memory' : data.neo4j_available ? 'built in Neo4j' : 'ready (local mode)'}`,
           icon: 'check', done: true,
         }])
+      } else if (eventType === 'memo_delta') {
+        setMemoDraft(prev => prev + data.delta)
       } else if (eventType === 'complete') {
-        setResult(data)
+        finished = true
+        setResult({ ...merged, ...data })
       } else if (eventType === 'error') {
+        finished = true
         setError(data.message)
       }
     }
@@ -135,10 +191,12 @@ export function useSSE() {
     if (abortRef.current) abortRef.current.abort()
     setSteps([])
     setResult(null)
+    setPartial(null)
+    setMemoDraft('')
     setError(null)
     setIsRunning(false)
     setDebugLog([])
   }, [])
 
-  return { run, steps, result, error, isRunning, abort, reset, debugLog }
+  return { run, steps, result, partial, memoDraft, error, isRunning, abort, reset, debugLog }
 }